@@ -6,11 +6,22 @@ import os
 import re 
 import time
 import shlex
+import sqlite3
+import json
+import bisect
+import array
 import concurrent.futures
+import contextlib
+import threading
+import hashlib
+import glob
+import io
+import tarfile
 import discord
 from discord.ext import commands, tasks
 import docker
 import asyncio
+import aiohttp
 import psutil
 from discord import app_commands, ui
 from discord.ui import Button, View, Select
@@ -22,6 +33,10 @@ TOKEN = ''
 RAM_LIMIT = '64g'
 SERVER_LIMIT = 100
 database_file = 'database.txt'
+REGISTRY_DB_FILE = 'registry.db'
+REGISTRY_JOURNAL_FILE = 'registry.journal'
+JOURNAL_COMPACT_BYTES = 256 * 1024  # fold the journal into registry.db past this size
+JOURNAL_COMPACT_SECONDS = 300       # ...or once the oldest entry is this old
 PUBLIC_IP = '138.68.79.95'
 YOUR_BOT_ID = '1396853238350876682'
 
@@ -33,12 +48,16 @@ intents.messages = False
 intents.message_content = False
 
 bot = commands.Bot(command_prefix='/', intents=intents)
-client = docker.from_env()
+# Shared docker-py client; None when the daemon is unreachable at startup.
+# Every call on it goes through docker_pool (see DOCKER ENGINE API below).
+try:
+    docker_client = docker.from_env()
+except Exception as e:
+    logging.warning(f"docker-py client unavailable: {e}")
+    docker_client = None
+client = docker_client
 
 # Helper functions
-def is_admin(user_id):
-    return user_id in ADMIN_IDS
-
 def generate_random_string(length=8):
     return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
 
@@ -74,44 +93,982 @@ def format_expiry_date(seconds_from_now):
     expiry_date = datetime.now() + timedelta(seconds=seconds_from_now)
     return expiry_date.strftime("%Y-%m-%d %H:%M:%S")
 
-def add_to_database(user, container_name, ssh_command, ram_limit=None, cpu_limit=None, creator=None, expiry=None, os_type="Ubuntu 22.04"):
-    with open(database_file, 'a') as f:
-        f.write(f"{user}|{container_name}|{ssh_command}|{ram_limit or '2048'}|{cpu_limit or '1'}|{creator or user}|{os_type}|{expiry or 'None'}\n")
+# ====== REGISTRY ======
+class VpsRecord:
+    """One registry row, normalized from whichever layout it was stored in.
+
+    Layouts understood by parse():
+      legacy      owner|name|ssh
+      create-vps  owner|name|created_ts|os|ram|cpu|disk
+      deploy      owner|name|ssh|ram|cpu|creator|os|expiry
+      v2          v2|owner|name|ssh|ram|cpu|creator|os|expiry|created_ts|disk
+      v3          v2 + |swap|pids
+    to_line() always writes v3; empty fields mean "not set".
+    """
+    __slots__ = ("owner", "name", "ssh", "ram", "cpu", "creator", "os_type", "expiry", "created", "disk",
+                 "swap", "pids")
+    VERSION = "v3"
+
+    def __init__(self, owner, name, ssh=None, ram=None, cpu=None, creator=None,
+                 os_type=None, expiry=None, created=None, disk=None, swap=None, pids=None):
+        self.owner = owner
+        self.name = name
+        self.ssh = ssh
+        self.ram = ram
+        self.cpu = cpu
+        self.creator = creator
+        self.os_type = os_type
+        self.expiry = expiry
+        self.created = created
+        self.disk = disk
+        self.swap = swap  # GB on top of ram, set by /resize; None = Docker's default (same as ram)
+        self.pids = pids
+
+    @classmethod
+    def parse(cls, line):
+        parts = line.strip().split('|')
+        n = len(parts)
+        if (n == 13 and parts[0] == cls.VERSION) or (n == 11 and parts[0] == "v2"):
+            _, owner, name, ssh, ram, cpu, creator, os_type, expiry, created, disk, *limits = [p or None for p in parts]
+            return cls(owner, name, ssh, ram, cpu, creator, os_type, expiry,
+                       float(created) if created else None, disk, *limits)
+        if n == 8:
+            owner, name, ssh, ram, cpu, creator, os_type, expiry = parts
+            return cls(owner, name, ssh, ram, cpu, creator, os_type,
+                       None if expiry == 'None' else expiry)
+        if n == 7:
+            owner, name, created, os_type, ram, cpu, disk = parts
+            try:
+                created = float(created)
+            except ValueError:
+                created = None
+            return cls(owner, name, os_type=os_type, ram=ram, cpu=cpu, created=created, disk=disk)
+        if n >= 2:
+            return cls(parts[0], parts[1], parts[2] if n >= 3 else None)
+        return None
 
-def remove_from_database(container_id):
-    if not os.path.exists(database_file):
-        return
-    with open(database_file, 'r') as f:
-        lines = f.readlines()
-    with open(database_file, 'w') as f:
-        for line in lines:
-            if container_id not in line:
-                f.write(line)
+    def to_line(self):
+        fields = (self.VERSION, self.owner, self.name, self.ssh, self.ram, self.cpu, self.creator,
+                  self.os_type, self.expiry, repr(self.created) if self.created else None, self.disk,
+                  self.swap, self.pids)
+        return '|'.join('' if f is None else str(f) for f in fields)
+
+    # Docker labels mirror the row (minus the SSH line, which is a credential)
+    # so the registry can be rebuilt from the containers themselves.
+    LABEL_PREFIX = "vps."
+    LABEL_FIELDS = ("owner", "creator", "os_type", "ram", "cpu", "disk", "expiry", "created", "swap", "pids")
+
+    def labels(self):
+        p = self.LABEL_PREFIX
+        labels = {f"{p}managed": "1", f"{p}plan": f"{self.ram or '-'} RAM / {self.cpu or '-'} CPU / {self.disk or '-'} disk"}
+        for field in self.LABEL_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                labels[p + field] = repr(value) if field == "created" else str(value)
+        return labels
+
+    @classmethod
+    def from_labels(cls, name, labels):
+        p = cls.LABEL_PREFIX
+        if labels.get(f"{p}managed") != "1" or not labels.get(f"{p}owner"):
+            return None
+        rec = cls(labels[f"{p}owner"], name)
+        for field in cls.LABEL_FIELDS[1:]:
+            value = labels.get(p + field)
+            if value:
+                setattr(rec, field, value)
+        if rec.created:
+            try:
+                rec.created = float(rec.created)
+            except ValueError:
+                rec.created = None
+        return rec
+
+    def running_time_str(self):
+        if not self.created:
+            return "Unknown"
+        running_time = time.time() - self.created
+        return f"{int(running_time // 3600)}h {int((running_time % 3600) // 60)}m"
+
+class RegistryIndex:
+    """Exact-match owner/name index over VpsRecords, plus sorted names for prefix search."""
+
+    def __init__(self):
+        self.rows = {}    # container_name -> VpsRecord
+        self.owners = {}  # owner -> {container_name: None}, insertion ordered
+        self.names = []   # sorted container names
+
+    def put(self, rec):
+        if rec.name in self.rows:
+            self.drop(rec.name)
+        self.rows[rec.name] = rec
+        self.owners.setdefault(rec.owner, {})[rec.name] = None
+        bisect.insort(self.names, rec.name)
+
+    def drop(self, container_name):
+        rec = self.rows.pop(container_name, None)
+        if rec is None:
+            return None
+        names = self.owners.get(rec.owner)
+        if names is not None:
+            names.pop(container_name, None)
+            if not names:
+                del self.owners[rec.owner]
+        i = bisect.bisect_left(self.names, container_name)
+        if i < len(self.names) and self.names[i] == container_name:
+            del self.names[i]
+        return rec
+
+    def get(self, container_name):
+        return self.rows.get(container_name)
+
+    def lookup(self, owner, container_name):
+        """The record named exactly container_name, if owner owns it."""
+        rec = self.rows.get(container_name)
+        return rec if rec is not None and rec.owner == owner else None
+
+    def owned_by(self, owner):
+        rows = self.rows
+        return [rows[name] for name in self.owners.get(owner, ())]
+
+    def count(self, owner=None):
+        if owner is None:
+            return len(self.rows)
+        return len(self.owners.get(owner, ()))
+
+    def search(self, prefix, owner=None, limit=25):
+        """Container names starting with prefix, optionally restricted to one owner."""
+        if owner is not None:
+            return sorted(n for n in self.owners.get(owner, ()) if n.startswith(prefix))[:limit]
+        i = bisect.bisect_left(self.names, prefix)
+        out = []
+        while i < len(self.names) and len(out) < limit and self.names[i].startswith(prefix):
+            out.append(self.names[i])
+            i += 1
+        return out
+
+REGISTRY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    container_name TEXT NOT NULL UNIQUE,
+    owner TEXT NOT NULL,
+    line TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS vps_owner ON vps(owner);
+CREATE TABLE IF NOT EXISTS shares (
+    container_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (container_name, user_id)
+);
+CREATE TABLE IF NOT EXISTS ssh_creds (
+    container_name TEXT PRIMARY KEY,
+    password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS pool_claims (
+    container_id TEXT PRIMARY KEY,
+    labels TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS volumes (
+    container_name TEXT PRIMARY KEY,
+    volume TEXT NOT NULL,
+    size_bytes INTEGER,
+    used_bytes INTEGER,
+    measured_at REAL
+);
+"""
+
+class ContainerRegistry:
+    """SQLite (WAL) store for VPS rows, shared access and SSH passwords.
+
+    Rows keep the same pipe-delimited layout database.txt used, with the
+    owner and container name pulled out into indexed columns.
+
+    VPS row mutations (add, remove, set_ssh, set_expiry) are not written to
+    SQLite directly: each one is appended as a single JSON line to the
+    journal and applied to the in-memory RegistryIndex. registry.db is the snapshot;
+    compact() replays the journal into it and truncates the journal. Every
+    journal entry is idempotent, so replaying after a crash mid-compaction
+    is safe. The index is rebuilt (snapshot + journal replay) only when
+    another connection commits to registry.db or the journal changes on disk.
+    """
+
+    def __init__(self, path, journal_path):
+        self.path = path
+        self.journal_path = journal_path
+        self._conn = None
+        self._journal = None
+        self._journal_since = None  # time of the oldest uncompacted entry
+        self._index = RegistryIndex()
+        self._sig = None
+
+    def _db(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(REGISTRY_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    # --- In-memory cache ---
+    def _stat_sig(self):
+        # data_version only moves on commits from *other* connections, so this
+        # process's share/password/volume/meta writes do not force a rebuild
+        version = self._db().execute("PRAGMA data_version").fetchone()[0]
+        try:
+            st = os.stat(self.journal_path)
+            journal = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            journal = None
+        return version, journal
+
+    def _fresh(self):
+        db = self._db()
+        sig = self._stat_sig()
+        if sig != self._sig:
+            self._index = RegistryIndex()
+            for (line,) in db.execute("SELECT line FROM vps ORDER BY id"):
+                rec = VpsRecord.parse(line)
+                if rec is not None:
+                    self._index.put(rec)
+            entries = self._read_journal()
+            for op in entries:
+                self._apply(op)
+            if entries and self._journal_since is None:
+                self._journal_since = time.time()
+            self._sig = sig
+
+    # --- Journal ---
+    @staticmethod
+    def _set_field(rec, kind, value):
+        if kind == "set_ssh":
+            rec.ssh = value
+        else:
+            rec.expiry = value
+
+    def _apply(self, op):
+        """Apply one journal entry to the in-memory dicts."""
+        kind, name = op["op"], op["name"]
+        if kind == "add":
+            rec = VpsRecord.parse(op["line"])
+            if rec is not None:
+                self._index.put(rec)
+        elif kind == "remove":
+            self._index.drop(name)
+        elif kind in ("set_ssh", "set_expiry"):
+            rec = self._index.get(name)
+            if rec is not None:
+                self._set_field(rec, kind, op["value"])
+
+    def _apply_sql(self, db, op):
+        """Apply one journal entry to the SQLite snapshot."""
+        kind, name = op["op"], op["name"]
+        if kind == "add":
+            db.execute(
+                "INSERT INTO vps (container_name, owner, line) VALUES (?, ?, ?) "
+                "ON CONFLICT(container_name) DO UPDATE SET owner=excluded.owner, line=excluded.line",
+                (name, op["owner"], op["line"])
+            )
+        elif kind == "remove":
+            db.execute("DELETE FROM vps WHERE container_name = ?", (name,))
+        elif kind in ("set_ssh", "set_expiry"):
+            row = db.execute("SELECT line FROM vps WHERE container_name = ?", (name,)).fetchone()
+            rec = VpsRecord.parse(row[0]) if row else None
+            if rec is not None:
+                self._set_field(rec, kind, op["value"])
+                db.execute("UPDATE vps SET line = ? WHERE container_name = ?", (rec.to_line(), name))
+
+    def _read_journal(self):
+        if not os.path.exists(self.journal_path):
+            return []
+        entries = []
+        with open(self.journal_path, 'r') as f:
+            for n, raw in enumerate(f, 1):
+                if not raw.endswith('\n'):
+                    break  # torn tail from a crash mid-append; _repair_journal cuts it
+                try:
+                    entries.append(json.loads(raw))
+                except ValueError:
+                    print(f"Registry journal: skipping unreadable line {n}")
+        return entries
+
+    def _repair_journal(self):
+        """Cut a torn tail back to the last complete line so the next append starts on a fresh line."""
+        try:
+            with open(self.journal_path, 'rb+') as f:
+                data = f.read()
+                end = data.rfind(b'\n') + 1
+                if end < len(data):
+                    print(f"Registry journal: dropping {len(data) - end} torn bytes at the end")
+                    f.truncate(end)
+        except FileNotFoundError:
+            pass
+
+    def _log(self, *ops):
+        """Append mutations to the journal and apply them in memory."""
+        self._fresh()
+        if self._journal is None:
+            self._repair_journal()
+            self._journal = open(self.journal_path, 'a')
+        self._journal.write(''.join(json.dumps(op) + '\n' for op in ops))
+        self._journal.flush()
+        for op in ops:
+            self._apply(op)
+        if self._journal_since is None:
+            self._journal_since = time.time()
+        self._sig = self._stat_sig()
+        if self._journal.tell() >= JOURNAL_COMPACT_BYTES:
+            self.compact()
+
+    def compact(self):
+        """Fold the journal into registry.db and truncate it."""
+        entries = self._read_journal()
+        if entries:
+            db = self._db()
+            db.execute("BEGIN")
+            try:
+                for op in entries:
+                    self._apply_sql(db, op)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        open(self.journal_path, 'w').close()
+        self._journal_since = None
+        self._sig = self._stat_sig()
+
+    def maybe_compact(self):
+        if self._journal_since is None:
+            return False
+        try:
+            size = os.path.getsize(self.journal_path)
+        except OSError:
+            return False
+        if size >= JOURNAL_COMPACT_BYTES or time.time() - self._journal_since >= JOURNAL_COMPACT_SECONDS:
+            self.compact()
+            return True
+        return False
+
+    # --- VPS rows ---
+    @staticmethod
+    def op_add(rec):
+        return {"op": "add", "name": rec.name, "owner": rec.owner, "line": rec.to_line()}
+
+    @staticmethod
+    def op_remove(container_name):
+        return {"op": "remove", "name": container_name}
+
+    @staticmethod
+    def op_set_ssh(container_name, ssh_command):
+        return {"op": "set_ssh", "name": container_name, "value": ssh_command}
+
+    @staticmethod
+    def op_set_expiry(container_name, expiry):
+        return {"op": "set_expiry", "name": container_name, "value": expiry}
+
+    def apply(self, ops):
+        """Append a batch of mutations with a single journal write."""
+        if ops:
+            self._log(*ops)
+
+    def add(self, rec):
+        self._log(self.op_add(rec))
+
+    def remove(self, container_name):
+        self._log(self.op_remove(container_name))
+
+    def set_ssh(self, container_name, ssh_command):
+        self._log(self.op_set_ssh(container_name, ssh_command))
+
+    def set_expiry(self, container_name, expiry):
+        self._log(self.op_set_expiry(container_name, expiry))
+
+    def get(self, container_name):
+        self._fresh()
+        return self._index.get(container_name)
+
+    def lookup(self, owner, container_name):
+        self._fresh()
+        return self._index.lookup(owner, container_name)
+
+    def by_owner(self, owner):
+        self._fresh()
+        return self._index.owned_by(owner)
+
+    def all(self):
+        self._fresh()
+        return list(self._index.rows.values())
+
+    def count(self, owner=None):
+        self._fresh()
+        return self._index.count(owner)
+
+    def search(self, prefix, owner=None, limit=25):
+        self._fresh()
+        return self._index.search(prefix, owner, limit)
+
+    # --- Shared access ---
+    def all_shares(self):
+        return self._db().execute("SELECT container_name, user_id FROM shares ORDER BY rowid").fetchall()
+
+    def shares(self, container_name):
+        rows = self._db().execute("SELECT user_id FROM shares WHERE container_name = ? ORDER BY rowid", (container_name,))
+        return [r[0] for r in rows]
+
+    def add_share(self, container_name, user_id):
+        self._db().execute("INSERT OR IGNORE INTO shares (container_name, user_id) VALUES (?, ?)", (container_name, str(user_id)))
+
+    def remove_share(self, container_name, user_id):
+        self._db().execute("DELETE FROM shares WHERE container_name = ? AND user_id = ?", (container_name, str(user_id)))
+
+    def remove_shares(self, container_name):
+        self._db().execute("DELETE FROM shares WHERE container_name = ?", (container_name,))
+
+    # --- SSH passwords ---
+    def get_password(self, container_name):
+        row = self._db().execute("SELECT password FROM ssh_creds WHERE container_name = ?", (container_name,)).fetchone()
+        return row[0] if row else None
+
+    def set_password(self, container_name, password):
+        self._db().execute("INSERT OR REPLACE INTO ssh_creds (container_name, password) VALUES (?, ?)", (container_name, password))
+
+    def all_passwords(self):
+        return self._db().execute("SELECT container_name, password FROM ssh_creds").fetchall()
+
+    def set_passwords(self, pairs):
+        """Upsert many (container_name, password) pairs in one transaction."""
+        db = self._db()
+        db.execute("BEGIN")
+        try:
+            db.executemany("INSERT OR REPLACE INTO ssh_creds (container_name, password) VALUES (?, ?)", pairs)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    # --- Warm-pool claims: the vps.* labels a claimed pool container could not be given ---
+    def set_pool_claim(self, container_id, labels):
+        self._db().execute("INSERT OR REPLACE INTO pool_claims (container_id, labels) VALUES (?, ?)",
+                           (container_id, json.dumps(labels)))
+
+    def pool_claims(self):
+        """{container id: labels dict}."""
+        return {cid: json.loads(labels) for cid, labels in
+                self._db().execute("SELECT container_id, labels FROM pool_claims")}
+
+    def drop_pool_claims(self, container_ids):
+        self._db().executemany("DELETE FROM pool_claims WHERE container_id = ?", [(cid,) for cid in container_ids])
+
+    # --- Data volumes ---
+    def get_volume(self, container_name):
+        """(volume, size_bytes, used_bytes, measured_at) or None."""
+        return self._db().execute(
+            "SELECT volume, size_bytes, used_bytes, measured_at FROM volumes WHERE container_name = ?",
+            (container_name,)
+        ).fetchone()
+
+    def set_volume(self, container_name, volume, size_bytes=None):
+        self._db().execute(
+            "INSERT INTO volumes (container_name, volume, size_bytes) VALUES (?, ?, ?) "
+            "ON CONFLICT(container_name) DO UPDATE SET volume=excluded.volume, size_bytes=excluded.size_bytes",
+            (container_name, volume, size_bytes)
+        )
+
+    def remove_volume(self, container_name):
+        self._db().execute("DELETE FROM volumes WHERE container_name = ?", (container_name,))
+
+    def all_volumes(self):
+        return self._db().execute("SELECT container_name, volume FROM volumes").fetchall()
+
+    def set_volume_usage(self, usage):
+        """Record measured bytes for many VPSs ({volume base: used_bytes}) in one transaction.
+
+        Returns the number of rows updated.
+        """
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN")
+        try:
+            cur = db.executemany("UPDATE volumes SET used_bytes = ?, measured_at = ? WHERE volume = ?",
+                                 [(used, now, base) for base, used in usage.items()])
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return cur.rowcount
+
+    # --- Small key/value settings ---
+    def get_meta(self, key):
+        row = self._db().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self._db().execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # --- One-shot import of the old flat files ---
+    def import_legacy(self, db_path, access_path, creds_path):
+        """Copy database.txt, access.txt and ssh_creds.txt into the registry once."""
+        conn = self._db()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return 0
+        imported = 0
+        conn.execute("BEGIN")
+        try:
+            if os.path.exists(db_path):
+                with open(db_path, 'r') as f:
+                    for line in f:
+                        rec = VpsRecord.parse(line)
+                        if rec is not None:
+                            self._apply_sql(conn, {"op": "add", "name": rec.name, "owner": rec.owner, "line": rec.to_line()})
+                            imported += 1
+            if os.path.exists(access_path):
+                with open(access_path, 'r') as f:
+                    for line in f:
+                        if '|' in line:
+                            cname, uid = line.strip().split('|', 1)
+                            self.add_share(cname, uid)
+            if os.path.exists(creds_path):
+                with open(creds_path, 'r') as f:
+                    for line in f:
+                        if '|' in line:
+                            cname, pwd = line.strip().split('|', 1)
+                            self.set_password(cname, pwd)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)", (str(time.time()),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._sig = None
+        return imported
+
+registry = ContainerRegistry(REGISTRY_DB_FILE, REGISTRY_JOURNAL_FILE)
+
+class QuotaTracker:
+    """Per-owner admission against SERVER_LIMIT.
+
+    Existing rows come from the registry index counters; deploys that have
+    passed admission but not yet written their row are held as reservations
+    so two concurrent claims cannot both slip under the limit.
+    """
+
+    def __init__(self, registry, limit):
+        self.registry = registry
+        self.limit = limit
+        self._pending = {}  # owner -> in-flight deploys
+
+    def used(self, owner):
+        return self.registry.count(owner) + self._pending.get(owner, 0)
+
+    def has_room(self, owner):
+        return self.used(owner) < self.limit
+
+    def reserve(self, owner):
+        if not self.has_room(owner):
+            return False
+        self._pending[owner] = self._pending.get(owner, 0) + 1
+        return True
+
+    def release(self, owner):
+        left = self._pending.get(owner, 0) - 1
+        if left > 0:
+            self._pending[owner] = left
+        else:
+            self._pending.pop(owner, None)
+
+quota = QuotaTracker(registry, SERVER_LIMIT)
+
+def quota_exceeded_embed(owner):
+    return discord.Embed(
+        title="❌ VPS Limit Reached",
+        description=f"`{owner}` already has {quota.used(owner)}/{SERVER_LIMIT} VPS instances.",
+        color=0xff0000
+    )
+
+class RegistryWriter:
+    """Single asyncio task that applies every registry mutation, in order.
+
+    Callers queue mutations and await their completion. The task drains
+    whatever has queued up (up to max_batch requests) and commits it with
+    one journal write, so concurrent deploys, starts and restarts never
+    interleave read-modify-write cycles.
+    """
+
+    def __init__(self, registry, max_batch=256):
+        self.registry = registry
+        self.max_batch = max_batch
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, *ops):
+        self.start()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((ops, fut))
+        await fut
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                self.registry.apply([op for ops, _ in batch for op in ops])
+                error = None
+            except Exception as e:
+                error = e
+            for _, fut in batch:
+                if fut.done():
+                    continue
+                if error is None:
+                    fut.set_result(None)
+                else:
+                    fut.set_exception(error)
+
+registry_writer = RegistryWriter(registry)
+
+async def add_to_database(user, container_name, ssh_command, ram_limit=None, cpu_limit=None, creator=None, expiry=None, os_type="Ubuntu 22.04"):
+    await add_record(VpsRecord(
+        str(user), container_name, ssh_command,
+        ram=ram_limit or '2048', cpu=cpu_limit or '1', creator=creator or user,
+        os_type=os_type, expiry=expiry, created=time.time()
+    ))
+
+async def add_record(rec):
+    await registry_writer.submit(ContainerRegistry.op_add(rec))
+
+async def remove_from_database(*container_ids):
+    await registry_writer.submit(*(ContainerRegistry.op_remove(c) for c in container_ids))
+
+async def update_ssh_command(container_id, ssh_command):
+    await registry_writer.submit(ContainerRegistry.op_set_ssh(container_id, ssh_command))
+
+async def update_expiry(container_id, expiry):
+    await registry_writer.submit(ContainerRegistry.op_set_expiry(container_id, expiry))
 
 def get_all_containers():
-    if not os.path.exists(database_file):
-        return []
-    with open(database_file, 'r') as f:
-        return [line.strip() for line in f.readlines()]
+    return registry.all()
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+def format_bytes(n):
+    """1288490188 -> '1.2GiB', the units `docker stats` prints."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024:
+            return f"{n:.4g}{unit}"
+        n /= 1024
+    return f"{n:.4g}TiB"
+
+class CgroupStats:
+    """Container usage read straight from the cgroup v2 filesystem.
+
+    A reading is a handful of small file reads under the container's scope
+    (systemd driver) or docker/ directory (cgroupfs driver), far cheaper
+    than `docker stats`, which samples for about two seconds. CPU percent
+    is the usage_usec delta since the previous reading of the same
+    container, so the first reading has none. `read` returns None whenever
+    the files are not there or not readable, and callers fall back to the API.
+    """
+
+    def __init__(self, root=CGROUP_ROOT):
+        self.root = root
+        self.available = os.path.exists(os.path.join(root, "cgroup.controllers"))
+        self._last = {}  # container id -> (usage_usec, monotonic time)
+
+    def path(self, cid):
+        for rel in (f"system.slice/docker-{cid}.scope", f"docker/{cid}"):
+            full = os.path.join(self.root, rel)
+            if os.path.isdir(full):
+                return full
+        return None
+
+    @staticmethod
+    def _read(path, name):
+        with open(os.path.join(path, name)) as f:
+            return f.read().strip()
+
+    def read(self, cid):
+        if not self.available or not cid:
+            return None
+        path = self.path(cid)
+        if path is None:
+            return None
+        try:
+            mem = int(self._read(path, "memory.current"))
+            mem_max = self._read(path, "memory.max")
+            cpu_stat = dict(line.split() for line in self._read(path, "cpu.stat").splitlines())
+            quota, period = self._read(path, "cpu.max").split()
+            io_read = io_write = 0
+            for line in self._read(path, "io.stat").splitlines():
+                for field in line.split()[1:]:
+                    key, _, value = field.partition("=")
+                    if key == "rbytes":
+                        io_read += int(value)
+                    elif key == "wbytes":
+                        io_write += int(value)
+            pids = int(self._read(path, "pids.current"))
+        except (OSError, ValueError):
+            return None
+
+        usage = int(cpu_stat["usage_usec"])
+        now = time.monotonic()
+        prev = self._last.get(cid)
+        self._last[cid] = (usage, now)
+        cpu_percent = None
+        if prev and now > prev[1]:
+            cpu_percent = (usage - prev[0]) / ((now - prev[1]) * 1e6) * 100
 
-def get_container_stats(container_id):
-    try:
-        # Get memory usage
-        mem_stats = subprocess.check_output(["docker", "stats", container_id, "--no-stream", "--format", "{{.MemUsage}}"]).decode().strip()
-        
-        # Get CPU usage
-        cpu_stats = subprocess.check_output(["docker", "stats", container_id, "--no-stream", "--format", "{{.CPUPerc}}"]).decode().strip()
-        
-        # Get container status
-        status = subprocess.check_output(["docker", "inspect", "--format", "{{.State.Status}}", container_id]).decode().strip()
-        
         return {
-            "memory": mem_stats,
-            "cpu": cpu_stats,
-            "status": "🟢 Running" if status == "running" else "🔴 Stopped"
+            "memory": mem,
+            "memory_max": None if mem_max == "max" else int(mem_max),
+            "cpu_percent": cpu_percent,
+            "cpu_limit": None if quota == "max" else int(quota) / int(period),
+            "io_read": io_read,
+            "io_write": io_write,
+            "pids": pids,
         }
-    except Exception:
-        return {"memory": "N/A", "cpu": "N/A", "status": "🔴 Stopped"}
+
+    def net_bytes(self, cid):
+        """(rx, tx) bytes on the container's interfaces, read via one of its processes."""
+        path = self.path(cid) if self.available and cid else None
+        if path is None:
+            return None
+        try:
+            pid = self._read(path, "cgroup.procs").split()[0]
+            rx = tx = 0
+            with open(f"/proc/{pid}/net/dev") as f:
+                for line in f.readlines()[2:]:
+                    iface, _, data = line.partition(":")
+                    if iface.strip() == "lo":
+                        continue
+                    fields = data.split()
+                    rx += int(fields[0])
+                    tx += int(fields[8])
+            return rx, tx
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def retain(self, cids):
+        """Drop CPU baselines of containers that no longer exist."""
+        for cid in set(self._last) - set(cids):
+            del self._last[cid]
+
+    @staticmethod
+    def usage(reading):
+        """The {"memory", "cpu"} strings the views print, in `docker stats` format."""
+        limit = format_bytes(reading["memory_max"]) if reading["memory_max"] else "unlimited"
+        cpu = "N/A" if reading["cpu_percent"] is None else f"{reading['cpu_percent']:.2f}%"
+        return {"memory": f"{format_bytes(reading['memory'])} / {limit}", "cpu": cpu}
+
+cgroups = CgroupStats()
+
+SAMPLE_INTERVAL = 5    # seconds between background samples
+SAMPLE_WINDOW = 120    # samples kept per metric (10 minutes at 5s)
+
+class RingBuffer:
+    """Fixed number of float samples in an array('d'); the oldest is overwritten."""
+    __slots__ = ("data", "pos", "count")
+
+    def __init__(self, size):
+        self.data = array.array("d", bytes(8 * size))
+        self.pos = 0
+        self.count = 0
+
+    def push(self, value):
+        self.data[self.pos] = value
+        self.pos = (self.pos + 1) % len(self.data)
+        self.count = min(self.count + 1, len(self.data))
+
+    def last(self):
+        return self.data[self.pos - 1] if self.count else None
+
+    def recent(self, n=None):
+        """The newest n samples (all kept samples by default), newest first."""
+        n = self.count if n is None else min(n, self.count)
+        size = len(self.data)
+        return [self.data[(self.pos - 1 - i) % size] for i in range(n)]
+
+    def avg(self, n=None):
+        values = self.recent(n)
+        return sum(values) / len(values) if values else None
+
+    def peak(self, n=None):
+        values = self.recent(n)
+        return max(values) if values else None
+
+class ContainerSeries:
+    """Per-container ring buffers, one per metric; rates are per second."""
+    METRICS = ("cpu", "memory", "io_read", "io_write", "net_rx", "net_tx")
+    __slots__ = METRICS + ("memory_max", "_counters", "taken")
+
+    def __init__(self, size=SAMPLE_WINDOW):
+        for metric in self.METRICS:
+            setattr(self, metric, RingBuffer(size))
+        self.memory_max = None
+        self._counters = None  # (io_read, io_write, net_rx, net_tx, monotonic) of the previous sample
+        self.taken = 0.0
+
+    def add(self, reading, net, now):
+        counters = (reading["io_read"], reading["io_write"]) + (net or (0, 0)) + (now,)
+        prev, self._counters = self._counters, counters
+        if reading["cpu_percent"] is None or prev is None:
+            return  # first sample only sets the baselines
+        elapsed = now - prev[4] or 1
+        self.cpu.push(reading["cpu_percent"])
+        self.memory.push(reading["memory"])
+        self.memory_max = reading["memory_max"]
+        for i, metric in enumerate(("io_read", "io_write", "net_rx", "net_tx")):
+            getattr(self, metric).push(max(0, counters[i] - prev[i]) / elapsed)
+        self.taken = now
+
+class StatsSampler:
+    """Background sampler: every SAMPLE_INTERVAL seconds, read each running
+    container's cgroup and push the numbers into its ContainerSeries.
+
+    Memory is bounded at len(METRICS) * SAMPLE_WINDOW doubles per container,
+    and series of stopped or removed containers are dropped. Views read
+    `usage`, which only looks at the newest slot of each buffer and only
+    if that container was sampled within the last two intervals.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, window=SAMPLE_WINDOW):
+        self.interval = interval
+        self.window = window
+        self.series = {}
+        self.taken = 0.0
+
+    def sample(self):
+        now = time.monotonic()
+        sampled = []
+        for name, st in list(state_cache.states.items()):
+            if st.status != "running":
+                continue
+            sampled.append(st.id)
+            reading = cgroups.read(st.id)
+            if reading is None:
+                continue
+            series = self.series.get(name)
+            if series is None:
+                series = self.series[name] = ContainerSeries(self.window)
+            series.add(reading, cgroups.net_bytes(st.id), now)
+        for name in list(self.series):
+            st = state_cache.states.get(name)
+            if st is None or st.status != "running":
+                del self.series[name]
+        cgroups.retain(sampled)
+        self.taken = now
+
+    def fresh(self):
+        return self.taken and time.monotonic() - self.taken < 2 * self.interval
+
+    def get(self, name):
+        return self.series.get(name)
+
+    def usage(self, name):
+        """{"memory", "cpu"} strings from the latest sample, or None if not sampled."""
+        series = self.series.get(name)
+        if series is None or not series.cpu.count or time.monotonic() - series.taken >= 2 * self.interval:
+            return None
+        limit = format_bytes(series.memory_max) if series.memory_max else "unlimited"
+        return {
+            "memory": f"{format_bytes(series.memory.last())} / {limit}",
+            "cpu": f"{series.cpu.last():.2f}%",
+        }
+
+stats_sampler = StatsSampler()
+
+STATS_TTL = 10  # seconds a stats snapshot is reused before it is read again
+
+class StatsCollector:
+    """CPU / memory for every container in one pass.
+
+    Readings come from cgroups when the host exposes them, otherwise from a
+    single `docker stats --no-stream`. Listing views share one snapshot
+    instead of sampling each container in turn; concurrent callers wait on
+    the same run, and a snapshot younger than `ttl` is returned as is.
+    Status comes from state_cache.
+    """
+
+    def __init__(self, ttl=STATS_TTL):
+        self.ttl = ttl
+        self.rows = {}
+        self.taken = 0.0
+        self._pending = None
+
+    def _read_cgroups(self):
+        rows = {}
+        for name, st in list(state_cache.states.items()):
+            reading = cgroups.read(st.id)
+            if reading:
+                rows[name] = reading
+        cgroups.retain(st.id for st in state_cache.states.values())
+        return rows
+
+    async def _collect(self):
+        if cgroups.available and state_cache.live:
+            rows = self._read_cgroups()
+            if any(r["cpu_percent"] is None for r in rows.values()):
+                # first sight of some containers: a short second pass gives them a CPU delta
+                await asyncio.sleep(0.25)
+                rows = self._read_cgroups()
+            self.rows = {name: CgroupStats.usage(r) for name, r in rows.items()}
+            self.taken = time.monotonic()
+            return
+        with docker_breaker.call():
+            proc = await asyncio.create_subprocess_exec(
+                "docker", "stats", "--all", "--no-stream", "--format", "{{json .}}",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            try:
+                out, _ = await asyncio.wait_for(proc.communicate(), DOCKER_DEADLINES["read"])
+            except asyncio.TimeoutError:
+                proc.kill()
+                raise
+        rows = {}
+        for line in out.decode(errors="replace").splitlines():
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            rows[row.get("Name")] = {"memory": row.get("MemUsage", "N/A"), "cpu": row.get("CPUPerc", "N/A")}
+        self.rows = rows
+        self.taken = time.monotonic()
+
+    def _done(self, _future):
+        self._pending = None
+
+    async def snapshot(self):
+        if stats_sampler.fresh() or (self.rows and time.monotonic() - self.taken < self.ttl):
+            return self
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._collect())
+            self._pending.add_done_callback(self._done)
+        try:
+            await asyncio.shield(self._pending)
+        except (OSError, asyncio.TimeoutError, DockerAPIError) as e:
+            print(f"docker stats failed: {e}")
+        return self
+
+    def get(self, name):
+        row = stats_sampler.usage(name)
+        if row is None and not stats_sampler.fresh():
+            # rows are only re-read while the sampler is down; otherwise they may be stale
+            row = self.rows.get(name)
+        row = row or {"memory": "N/A", "cpu": "N/A"}
+        return {**row, "status": state_cache.badge(name)}
+
+stats_collector = StatsCollector()
 
 def get_system_stats():
     try:
@@ -146,52 +1103,1445 @@ def get_system_stats():
             "error": str(e)
         }
 
-async def capture_ssh_session_line(process):
-    while True:
-        output = await process.stdout.readline()
-        if not output:
-            break
-        output = output.decode('utf-8').strip()
-        if "ssh session:" in output:
-            return output.split("ssh session:")[1].strip()
-    return None
+# ====== DOCKER ENGINE API ======
+DOCKER_SOCKET = '/var/run/docker.sock'
+DOCKER_API_TIMEOUT = 30  # seconds, per call unless overridden
+# Per-operation deadlines (seconds); a call that overruns counts against the breaker
+DOCKER_DEADLINES = {
+    "ping": 5,
+    "read": 10,        # inspect, list, stats
+    "lifecycle": 30,   # start / pause / remove; stop and restart add their grace period
+    "create": 60,
+    "exec": 300,       # setup scripts run inside a VPS
+    "build": 1800,     # image build or pull
+}
+BREAKER_THRESHOLD = 3  # consecutive timeouts before Docker calls start failing fast
+BREAKER_COOLDOWN = 30  # seconds to fail fast before letting one probe call through
+
+class DockerAPIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+class DockerUnavailable(DockerAPIError):
+    def __init__(self, retry_in):
+        super().__init__(503, f"Docker is not responding, retrying in {retry_in:.0f}s")
+
+class CircuitBreaker:
+    """Fail fast while dockerd is hung instead of stacking up calls that will time out.
+
+    After `threshold` consecutive timeouts the breaker opens and `check`
+    raises DockerUnavailable for `cooldown` seconds. Then a single probe call
+    is let through: success closes the breaker, another timeout reopens it.
+    Docker calls run inside `with docker_breaker.call():` so every call,
+    the probe included, is settled however it ends.
+    """
+
+    # deadline and connection failures; any other error still means the daemon answered
+    FAILURES = (asyncio.TimeoutError, concurrent.futures.TimeoutError, subprocess.TimeoutExpired,
+                ConnectionError, aiohttp.ClientConnectionError)
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.trips = 0
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def retry_in(self):
+        if self.opened_at is None:
+            return 0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def check(self):
+        state = self.state
+        if state == "open" or (state == "half-open" and self.probing):
+            raise DockerUnavailable(self.retry_in())
+        if state == "half-open":
+            self.probing = True
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            if self.opened_at is None or self.probing:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+    def healthy(self):
+        return self.state != "open"
+
+    @contextlib.contextmanager
+    def call(self):
+        """check() on entry, then success() or failure() by how the call ended.
+
+        A cancelled call gives its probe slot back without a verdict.
+        """
+        self.check()
+        verdict = None
+        try:
+            yield
+            verdict = self.success
+        except self.FAILURES:
+            verdict = self.failure
+            raise
+        except Exception:
+            verdict = self.success
+            raise
+        finally:
+            if verdict is not None:
+                verdict()
+            else:
+                self.probing = False
+
+docker_breaker = CircuitBreaker()
+
+# Everything a Docker API call can raise; callers catch this tuple
+DOCKER_ERRORS = (DockerAPIError, asyncio.TimeoutError, aiohttp.ClientError)
+
+def parse_size(value):
+    """'2g' / '512m' / 2048 (bytes) -> bytes, the way `docker run --memory` reads it."""
+    s = str(value).strip().lower().rstrip('b')
+    units = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+    if s and s[-1] in units:
+        return int(float(s[:-1]) * units[s[-1]])
+    return int(float(s))
+
+class AsyncDocker:
+    """Minimal asyncio client for the Docker Engine API over the unix socket.
+
+    One aiohttp session (and its keep-alive connection pool) is reused for
+    every request/response call. Streams that stay open indefinitely (the
+    event feed, tmate exec output) hold a connection each, so they get a
+    second, unbounded session; otherwise enough running tmate sessions
+    would use up the pool and every other call would queue forever.
+    Each call has its own timeout; exec output can be streamed line by line.
+    """
+
+    def __init__(self, socket_path=DOCKER_SOCKET, timeout=DOCKER_API_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._session = None
+        self._stream_session = None
+
+    def _sess(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.UnixConnector(path=self.socket_path))
+        return self._session
+
+    def _stream_sess(self):
+        if self._stream_session is None or self._stream_session.closed:
+            self._stream_session = aiohttp.ClientSession(
+                connector=aiohttp.UnixConnector(path=self.socket_path, limit=0))
+        return self._stream_session
+
+    @staticmethod
+    def _params(params):
+        if not params:
+            return None
+        out = {}
+        for k, v in params.items():
+            if v is None:
+                continue
+            if isinstance(v, bool):
+                v = "1" if v else "0"
+            elif isinstance(v, (dict, list)):
+                v = json.dumps(v)
+            out[k] = str(v)
+        return out
+
+    @staticmethod
+    async def _raise_for(resp):
+        if resp.status < 400:
+            return
+        body = await resp.read()
+        try:
+            message = json.loads(body).get("message", "")
+        except ValueError:
+            message = body.decode(errors="replace")
+        raise DockerAPIError(resp.status, message.strip())
+
+    async def request(self, method, path, params=None, body=None, timeout=None):
+        t = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        with docker_breaker.call():
+            async with self._sess().request(method, f"http://docker{path}", params=self._params(params),
+                                            json=body, timeout=t) as resp:
+                await self._raise_for(resp)
+                if resp.content_type == "application/json":
+                    return await resp.json()
+                return await resp.read()
+
+    async def ping(self, timeout=DOCKER_DEADLINES["ping"]):
+        return await self.request("GET", "/_ping", timeout=timeout) == b"OK"
+
+    # --- containers ---
+    async def containers(self, all=True, filters=None):
+        return await self.request("GET", "/containers/json", params={"all": all, "filters": filters},
+                                  timeout=DOCKER_DEADLINES["read"])
+
+    async def inspect(self, name):
+        return await self.request("GET", f"/containers/{name}/json", timeout=DOCKER_DEADLINES["read"])
+
+    async def state(self, name):
+        """State.Status ("running", "exited", ...) or None if there is no such container."""
+        try:
+            return (await self.inspect(name))["State"]["Status"]
+        except DockerAPIError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    async def create(self, name, image, host_config=None, **config):
+        body = {"Image": image, **config}
+        if host_config:
+            body["HostConfig"] = host_config
+        return (await self.request("POST", "/containers/create", params={"name": name}, body=body,
+                                   timeout=DOCKER_DEADLINES["create"]))["Id"]
+
+    async def start(self, name):
+        await self.request("POST", f"/containers/{name}/start", timeout=DOCKER_DEADLINES["lifecycle"])
+
+    async def stop(self, name, t=10):
+        await self.request("POST", f"/containers/{name}/stop", params={"t": t},
+                           timeout=DOCKER_DEADLINES["lifecycle"] + t)
+
+    async def restart(self, name, t=10):
+        await self.request("POST", f"/containers/{name}/restart", params={"t": t},
+                           timeout=DOCKER_DEADLINES["lifecycle"] + t)
+
+    async def remove(self, name, force=False):
+        await self.request("DELETE", f"/containers/{name}", params={"force": force},
+                           timeout=DOCKER_DEADLINES["lifecycle"])
+
+    async def pause(self, name):
+        await self.request("POST", f"/containers/{name}/pause", timeout=DOCKER_DEADLINES["lifecycle"])
+
+    async def unpause(self, name):
+        await self.request("POST", f"/containers/{name}/unpause", timeout=DOCKER_DEADLINES["lifecycle"])
+
+    async def destroy(self, name, t=10):
+        """stop + remove; a container that is already gone counts as removed."""
+        try:
+            await self.stop(name, t)
+            await self.remove(name, force=True)
+        except DockerAPIError as e:
+            if e.status != 404:
+                raise
+
+    async def run(self, name, image, host_config=None, **config):
+        """create + start, like `docker run -d`; returns the container id."""
+        cid = await self.create(name, image, host_config, **config)
+        await self.start(cid)
+        return cid
+
+    # --- images ---
+    async def image(self, name):
+        """Image inspect JSON, or None if the image is not present locally."""
+        try:
+            return await self.request("GET", f"/images/{name}/json", timeout=DOCKER_DEADLINES["read"])
+        except DockerAPIError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    async def pull(self, ref):
+        """`docker pull`; the progress stream is read to the end and discarded.
+
+        The reply is newline-delimited JSON, and a failed pull can still
+        answer 200 with an "error" object somewhere in it.
+        """
+        repo, _, tag = ref.partition(":")
+        t = aiohttp.ClientTimeout(total=DOCKER_DEADLINES["build"])
+        with docker_breaker.call():
+            async with self._sess().post("http://docker/images/create",
+                                         params=self._params({"fromImage": repo, "tag": tag or "latest"}),
+                                         timeout=t) as resp:
+                await self._raise_for(resp)
+                async for line in resp.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        progress = json.loads(line)
+                    except ValueError:
+                        continue
+                    if progress.get("error"):
+                        raise DockerAPIError(500, f"pull {ref}: {progress['error']}")
+
+    # --- volumes ---
+    async def create_volume(self, name, labels=None):
+        return await self.request("POST", "/volumes/create", body={"Name": name, "Labels": labels or {}},
+                                  timeout=DOCKER_DEADLINES["lifecycle"])
+
+    async def remove_volume(self, name):
+        await self.request("DELETE", f"/volumes/{name}", timeout=DOCKER_DEADLINES["lifecycle"])
+
+    async def volume_usage(self):
+        """{volume name: bytes used} from `docker system df -v`; sizes are computed by the daemon."""
+        df = await self.request("GET", "/system/df", params={"type": "volume"}, timeout=DOCKER_DEADLINES["build"])
+        return {v["Name"]: (v.get("UsageData") or {}).get("Size", -1) for v in df.get("Volumes") or []}
+
+    async def rename(self, name, new_name):
+        await self.request("POST", f"/containers/{name}/rename", params={"name": new_name},
+                           timeout=DOCKER_DEADLINES["lifecycle"])
+
+    async def update(self, name, memory=None, cpus=None, swap=None, pids=None):
+        """`docker update --memory ... --memory-swap ... --cpus ... --pids-limit ...` on a live container.
+
+        Limits are rewritten in the container's cgroup, so they apply at once
+        without a restart.
+        """
+        body = {}
+        if memory is not None:
+            body["Memory"] = parse_size(memory)
+            # what `docker run --memory` defaults swap to; --memory-swap counts memory + swap
+            body["MemorySwap"] = body["Memory"] + parse_size(swap) if swap is not None else 2 * body["Memory"]
+        if cpus is not None:
+            body["NanoCpus"] = int(float(cpus) * 1e9)
+        if pids is not None:
+            body["PidsLimit"] = int(pids)
+        return await self.request("POST", f"/containers/{name}/update", body=body,
+                                  timeout=DOCKER_DEADLINES["lifecycle"])
+
+    # --- exec ---
+    async def _exec_create(self, name, cmd):
+        body = {"AttachStdout": True, "AttachStderr": True, "Tty": False, "Cmd": cmd}
+        return (await self.request("POST", f"/containers/{name}/exec", body=body))["Id"]
+
+    async def exec_stream(self, name, cmd):
+        """Run cmd in the container and yield its output (stdout+stderr) line by line.
+
+        The connection stays open for as long as the caller iterates, so a
+        long-running process such as `tmate -F` keeps its pipes.
+        """
+        exec_id = await self._exec_create(name, cmd)
+        async for line in self._exec_start(exec_id, self._stream_sess()):
+            yield line
+
+    async def _exec_start(self, exec_id, session=None):
+        t = aiohttp.ClientTimeout(total=None, connect=self.timeout)
+        async with (session or self._sess()).post(f"http://docker/exec/{exec_id}/start",
+                                     json={"Detach": False, "Tty": False}, timeout=t) as resp:
+            await self._raise_for(resp)
+            buf = b""
+            while True:
+                try:
+                    # multiplexed stream: 8-byte header (stream, 0, 0, 0, big-endian size) + payload
+                    header = await resp.content.readexactly(8)
+                    frame = await resp.content.readexactly(int.from_bytes(header[4:], "big"))
+                except asyncio.IncompleteReadError:
+                    break
+                buf += frame
+                *lines, buf = buf.split(b"\n")
+                for line in lines:
+                    yield line.decode("utf-8", errors="replace").rstrip("\r")
+            if buf:
+                yield buf.decode("utf-8", errors="replace")
+
+    async def exec_run(self, name, cmd, timeout=None):
+        """Run cmd to completion; returns (exit_code, output)."""
+        exec_id = await self._exec_create(name, cmd)
+
+        async def collect():
+            return [line async for line in self._exec_start(exec_id)]
+
+        with docker_breaker.call():
+            lines = await asyncio.wait_for(collect(), timeout or DOCKER_DEADLINES["exec"])
+        exit_code = (await self.request("GET", f"/exec/{exec_id}/json")).get("ExitCode")
+        return exit_code, "\n".join(lines)
+
+    async def events(self, filters=None, since=None):
+        """Yield decoded /events objects until the daemon closes the stream."""
+        t = aiohttp.ClientTimeout(total=None, connect=self.timeout)
+        async with self._stream_sess().get("http://docker/events", params=self._params({"filters": filters, "since": since}),
+                                    timeout=t) as resp:
+            await self._raise_for(resp)
+            async for line in resp.content:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+docker_api = AsyncDocker()
+
+VPS_VOLUME_MOUNTS = ("/root", "/home")  # kept on named volumes across reinstall and recreate
+
+def volume_names(base):
+    """The named volumes behind one VPS: <base>-root, <base>-home."""
+    return [f"{base}-{target.strip('/')}" for target in VPS_VOLUME_MOUNTS]
+
+def vps_mounts(base):
+    return [{"Type": "volume", "Source": vol, "Target": target}
+            for vol, target in zip(volume_names(base), VPS_VOLUME_MOUNTS)]
+
+def vps_host_config(memory, cpus, privileged=True, volume=None):
+    """HostConfig for `docker run [--privileged --cap-add=ALL] --memory=... --cpus=... [-v ...]`."""
+    host_config = {"Memory": parse_size(memory), "NanoCpus": int(float(cpus) * 1e9)}
+    if privileged:
+        host_config.update({"Privileged": True, "CapAdd": ["ALL"]})
+    if volume:
+        host_config["Mounts"] = vps_mounts(volume)
+    return host_config
+
+class DockerBusy(DockerAPIError):
+    def __init__(self, depth):
+        super().__init__(503, f"Docker is busy ({depth} calls queued), try again shortly")
+
+class DockerExecutor:
+    """Bounded thread pool for blocking docker-py calls.
+
+    At most `workers` SDK calls run at once and at most `max_pending` may be
+    waiting; past that `run` raises DockerBusy instead of piling up. Callers
+    stop waiting after `timeout` even if the daemon has not answered, so a
+    slow daemon costs a thread, never the event loop.
+    """
+
+    def __init__(self, workers=4, max_pending=32, timeout=DOCKER_API_TIMEOUT):
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="docker")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0   # submitted and not yet finished
+        self.running = 0   # currently executing in a worker
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0  # moving average of call latency
+        self.max_ms = 0.0
+        self.wait_ms = 0.0  # moving average of time spent queued
+        self._lock = threading.Lock()
+
+    def _timed(self, submitted, fn, args, kwargs):
+        started = time.monotonic()
+        with self._lock:
+            self.running += 1
+            self.wait_ms = self.wait_ms * 0.8 + (started - submitted) * 1000 * 0.2
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            ms = (time.monotonic() - started) * 1000
+            with self._lock:
+                self.running -= 1
+                self.last_ms = ms
+                self.avg_ms = ms if self.calls == 0 else self.avg_ms * 0.8 + ms * 0.2
+                self.max_ms = max(self.max_ms, ms)
+                self.calls += 1
+
+    async def run(self, fn, *args, timeout=None, **kwargs):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise DockerBusy(self.depth)
+        with docker_breaker.call():
+            self.pending += 1
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.pool, self._timed, time.monotonic(), fn, args, kwargs)
+            future.add_done_callback(self._finished)
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+
+    def _finished(self, _future):
+        self.pending -= 1
+
+    @property
+    def depth(self):
+        """Calls waiting for a free worker."""
+        return max(0, self.pending - self.running)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queued": self.depth,
+            "in_flight": self.running,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "last_ms": round(self.last_ms, 1),
+            "avg_ms": round(self.avg_ms, 1),
+            "max_ms": round(self.max_ms, 1),
+            "wait_ms": round(self.wait_ms, 1),
+        }
 
-def get_ssh_command_from_database(container_id):
-    if not os.path.exists(database_file):
+docker_pool = DockerExecutor()
+
+class ContainerState:
+    __slots__ = ("status", "health", "oom_killed", "exit_code", "id")
+
+    def __init__(self, status, health=None, oom_killed=False, exit_code=None, id=None):
+        self.id = id                  # full container id, names the cgroup directory
+        self.status = status          # created / running / paused / restarting / exited / dead
+        self.health = health          # healthy / unhealthy / starting, or None without a HEALTHCHECK
+        self.oom_killed = oom_killed
+        self.exit_code = exit_code
+
+    def badge(self):
+        if self.status == "running":
+            text = "🟢 Online"
+            if self.health and self.health != "healthy":
+                text += f" ({self.health})"
+            return text
+        if self.status == "paused":
+            return "⏸️ Paused"
+        if self.status == "restarting":
+            return "🔄 Restarting"
+        if self.oom_killed:
+            return "💥 OOM-killed"
+        return "🔴 Offline"
+
+# events that move a container into a plain state
+_EVENT_STATUS = {
+    "create": "created", "start": "running", "restart": "running", "unpause": "running",
+    "pause": "paused", "die": "exited", "stop": "exited",
+}
+
+class ContainerStateCache:
+    """container name -> ContainerState, kept current from the Docker /events stream.
+
+    Primed with one container listing, then updated in place by events, so
+    status badges are dict lookups rather than a `docker inspect` per
+    container. If the stream drops, the cache is re-primed on reconnect.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.states = {}
+        self.live = False
+        self._task = None
+
+    @staticmethod
+    def _health(status_text):
+        # `docker ps` Status column: "Up 3 hours (healthy)"
+        m = re.search(r"\((healthy|unhealthy|health: starting)\)", status_text or "")
+        return m.group(1).replace("health: ", "") if m else None
+
+    async def prime(self):
+        states = {}
+        for c in await self.api.containers(all=True):
+            for name in c.get("Names") or []:
+                states[name.lstrip("/")] = ContainerState(c.get("State"), self._health(c.get("Status")), id=c.get("Id"))
+        self.states = states
+
+    def apply_event(self, ev):
+        if ev.get("Type") != "container":
+            return
+        action = ev.get("Action") or ev.get("status") or ""
+        attrs = (ev.get("Actor") or {}).get("Attributes") or {}
+        name = attrs.get("name")
+        if not name:
+            return
+        if action == "destroy":
+            self.states.pop(name, None)
+            return
+        if action == "rename":
+            old = (attrs.get("oldName") or "").lstrip("/")
+            st = self.states.pop(old, None)
+            if st:
+                self.states[name] = st
+            return
+        st = self.states.get(name)
+        if st is None:
+            st = self.states[name] = ContainerState("created", id=(ev.get("Actor") or {}).get("ID"))
+        if action.startswith("health_status"):
+            st.health = action.split(":", 1)[1].strip()
+        elif action == "oom":
+            st.oom_killed = True
+        elif action in _EVENT_STATUS:
+            status = st.status = _EVENT_STATUS[action]
+            if action == "die":
+                st.exit_code = int(attrs.get("exitCode", 0) or 0)
+            elif status == "running":
+                st.oom_killed = False
+                st.exit_code = None
+                st.health = "starting" if st.health else None
+
+    async def run(self):
+        backoff = 1
+        while True:
+            try:
+                since = int(time.time())
+                await self.prime()
+                self.live = True
+                backoff = 1
+                # `since` replays anything that happened while the listing was in flight
+                async for ev in self.api.events(filters={"type": ["container"]}, since=since):
+                    self.apply_event(ev)
+            except asyncio.CancelledError:
+                raise
+            except (ValueError,) + DOCKER_ERRORS as e:
+                print(f"Docker event stream lost: {e}")
+            self.live = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def get(self, name):
+        return self.states.get(name)
+
+    def is_running(self, name):
+        st = self.states.get(name)
+        return st is not None and st.status == "running"
+
+    def badge(self, name):
+        st = self.states.get(name)
+        return st.badge() if st else "🔴 Unknown"
+
+    def counts(self):
+        """(total, running) across every container on the node."""
+        running = sum(1 for st in self.states.values() if st.status == "running")
+        return len(self.states), running
+
+state_cache = ContainerStateCache(docker_api)
+
+_background_streams = set()
+
+async def _drain(stream):
+    try:
+        async for _ in stream:
+            pass
+    except Exception:
+        pass
+
+async def exec_until(container_name, cmd, marker, timeout):
+    """Start a long-running cmd in the container and return its first output line containing marker.
+
+    The process keeps running after the line appears; its output stream is
+    handed to a background task so it is not cut off. None if the line does
+    not show up within timeout.
+    """
+    stream = docker_api.exec_stream(container_name, cmd)
+
+    async def first_line():
+        async for line in stream:
+            if marker in line:
+                return line
         return None
-    with open(database_file, 'r') as f:
+
+    try:
+        line = await asyncio.wait_for(first_line(), timeout)
+    except asyncio.TimeoutError:
+        await stream.aclose()
+        return None
+    if line:
+        task = asyncio.get_running_loop().create_task(_drain(stream))
+        _background_streams.add(task)
+        task.add_done_callback(_background_streams.discard)
+    return line
+
+async def tmate_session(container_name, timeout=60):
+    """Start `tmate -F` in the container and return its "ssh session:" line."""
+    line = await exec_until(container_name, ["tmate", "-F"], "ssh session:", timeout)
+    return line.split("ssh session:")[1].strip() if line else None
+
+BULK_CONCURRENCY = 16        # Engine calls in flight during a mass action
+BULK_PROGRESS_INTERVAL = 1.5  # seconds between progress embed edits
+
+class BulkOperation:
+    """Fan one lifecycle action (pause / unpause / stop / destroy) out over many containers.
+
+    At most `concurrency` calls run at once. Progress and the per-container
+    outcome are shown by editing a single embed, throttled to one edit per
+    BULK_PROGRESS_INTERVAL to stay clear of Discord rate limits.
+    """
+
+    ACTIONS = {
+        "pause": lambda name: docker_api.pause(name),
+        "unpause": lambda name: docker_api.unpause(name),
+        "stop": lambda name: docker_api.stop(name),
+        "destroy": lambda name: docker_api.destroy(name),
+    }
+
+    def __init__(self, title, action, names, concurrency=BULK_CONCURRENCY):
+        self.title = title
+        self.action = self.ACTIONS[action]
+        self.names = list(names)
+        self.concurrency = concurrency
+        self.succeeded = []
+        self.failed = {}  # name -> error text
+        self.started = None
+
+    def embed(self, finished=False):
+        done = len(self.succeeded) + len(self.failed)
+        total = len(self.names)
+        elapsed = time.monotonic() - self.started if self.started else 0
+        if finished:
+            color = 0x00ff00 if not self.failed else 0xffaa00
+        else:
+            color = 0x00aaff
+        embed = discord.Embed(
+            title=self.title,
+            description=f"**Progress:** {done}/{total}\n"
+                        f"✅ **Succeeded:** {len(self.succeeded)}\n"
+                        f"❌ **Failed:** {len(self.failed)}\n"
+                        f"⏱️ **Elapsed:** {elapsed:.1f}s",
+            color=color
+        )
+        if self.failed:
+            lines = [f"`{name}`: {err}" for name, err in list(self.failed.items())[:10]]
+            if len(self.failed) > 10:
+                lines.append(f"...and {len(self.failed) - 10} more")
+            embed.add_field(name="Failures", value="\n".join(lines)[:1024], inline=False)
+        if finished:
+            embed.set_footer(text="Done")
+        return embed
+
+    async def _one(self, sem, name):
+        async with sem:
+            try:
+                await self.action(name)
+                self.succeeded.append(name)
+            except DOCKER_ERRORS as e:
+                self.failed[name] = str(e) or type(e).__name__
+
+    async def run(self, message=None):
+        """Run to completion, editing `message` (if given) as items finish."""
+        self.started = time.monotonic()
+        sem = asyncio.Semaphore(self.concurrency)
+        work = asyncio.gather(*(self._one(sem, name) for name in self.names))
+        while message is not None:
+            await asyncio.wait([work], timeout=BULK_PROGRESS_INTERVAL)
+            finished = work.done()
+            try:
+                await message.edit(embed=self.embed(finished=finished))
+            except discord.HTTPException:
+                pass
+            if finished:
+                break
+        await work
+        return self
+
+def label_filter(owner=None):
+    """Server-side `label=` filters selecting bot-managed containers, optionally one owner's."""
+    p = VpsRecord.LABEL_PREFIX
+    labels = [f"{p}managed=1"]
+    if owner is not None:
+        labels.append(f"{p}owner={owner}")
+    return {"label": labels}
+
+async def labelled_servers(owner=None):
+    """VpsRecords read back from container labels with a single filtered list call.
+
+    Claimed warm-pool containers carry only vps.pool; their vps.* labels
+    were stored as pool claims at claim time and are read from there.
+    """
+    records = []
+    for c in await docker_api.containers(all=True, filters=label_filter(owner)):
+        names = c.get("Names") or []
+        rec = VpsRecord.from_labels(names[0].lstrip("/"), c.get("Labels") or {}) if names else None
+        if rec is not None:
+            records.append(rec)
+    claims = registry.pool_claims()
+    if claims:
+        for c in await docker_api.containers(all=True, filters={"label": [WarmPool.LABEL]}):
+            names = c.get("Names") or []
+            labels = claims.get(c.get("Id"))
+            rec = VpsRecord.from_labels(names[0].lstrip("/"), labels) if names and labels else None
+            if rec is not None and (owner is None or rec.owner == owner):
+                records.append(rec)
+    return records
+
+async def owned_container_names(owner):
+    """Registry rows plus any labelled container the registry has lost, via one filtered list call."""
+    names = {rec.name: None for rec in get_user_servers(owner)}
+    try:
+        for rec in await labelled_servers(owner):
+            names.setdefault(rec.name, None)
+    except DOCKER_ERRORS:
+        pass
+    return list(names)
+
+async def rebuild_registry_from_labels():
+    """Re-add every labelled container to the registry; SSH lines already recorded are kept.
+
+    Labels are fixed at creation, so an expiry changed later only survives
+    in the registry row, which wins whenever one exists.
+    """
+    ops = []
+    for rec in await labelled_servers():
+        known = registry.get(rec.name)
+        if known is not None:
+            continue
+        ops.append(ContainerRegistry.op_add(rec))
+    if ops:
+        await registry_writer.submit(*ops)
+    return len(ops)
+
+async def create_vps_volumes():
+    """Create a fresh /root + /home volume pair and return its base name.
+
+    Docker seeds an empty named volume from the image's directory on first
+    mount, so a new VPS still starts with the image's skeleton files.
+    """
+    base = f"vpsdata_{generate_random_string(12).lower()}"
+    try:
+        for vol in volume_names(base):
+            await docker_api.create_volume(vol, {VpsRecord.LABEL_PREFIX + "volume": base})
+    except DOCKER_ERRORS:
+        await remove_vps_volumes(base)
+        raise
+    return base
+
+async def remove_vps_volumes(base):
+    for vol in volume_names(base):
+        try:
+            await docker_api.remove_volume(vol)
+        except DOCKER_ERRORS:
+            pass
+
+async def drop_volumes_of(*container_names):
+    """Remove the data volumes of deleted VPSs and forget them in the registry."""
+    sem = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def one(name):
+        row = registry.get_volume(name)
+        if row is None:
+            return
+        async with sem:
+            await remove_vps_volumes(row[0])
+        registry.remove_volume(name)
+
+    await asyncio.gather(*(one(name) for name in container_names))
+
+def volume_size_bytes(disk):
+    """Plan disk size ('50g', '190gb') in bytes, or None when the plan has none."""
+    try:
+        return parse_size(disk) if disk else None
+    except ValueError:
+        return None
+
+def volume_usage_str(container_name):
+    row = registry.get_volume(container_name)
+    if row is None:
+        return "N/A"
+    _, size, used, _ = row
+    used_txt = format_bytes(used) if used is not None and used >= 0 else "?"
+    return f"{used_txt} / {format_bytes(size) if size else 'unlimited'}"
+
+TEMPLATE_DIR = 'os_templates'    # /reinstall templates: <name>.Dockerfile
+TEMPLATE_REPO = 'vps-template'   # built templates are tagged vps-template:<name>-<content hash>
+
+def _copied_sources(dockerfile_path):
+    """Source paths a Dockerfile pulls in with COPY / ADD (URLs and other stages excluded)."""
+    sources = []
+    with open(dockerfile_path) as f:
         for line in f:
-            if container_id in line:
-                parts = line.strip().split('|')
-                if len(parts) >= 3:
-                    return parts[2]
-    return None
+            parts = line.split()
+            if not parts or parts[0].upper() not in ("COPY", "ADD"):
+                continue
+            args = [p for p in parts[1:] if not p.startswith("--")]
+            if args and args[0].startswith("["):
+                try:
+                    args = json.loads(" ".join(args))
+                except ValueError:
+                    continue
+            if any(p.startswith("--from") for p in parts[1:]):
+                continue
+            sources.extend(src for src in args[:-1] if "://" not in src)
+    return sources
+
+def build_context(dockerfile_path):
+    """(sha256 hex, tar bytes) covering the Dockerfile and exactly the files it copies in.
+
+    The hash is over names and contents only, so the same template always
+    maps to the same tag; the tar is the whole build context, nothing else
+    from the directory is sent to the daemon.
+    """
+    base = os.path.dirname(dockerfile_path) or "."
+    files = [(dockerfile_path, "Dockerfile")]
+    for src in _copied_sources(dockerfile_path):
+        for match in sorted(glob.glob(os.path.join(base, src))):
+            if os.path.isdir(match):
+                for root, dirs, names in os.walk(match):
+                    dirs.sort()
+                    files.extend((os.path.join(root, n), os.path.relpath(os.path.join(root, n), base)) for n in sorted(names))
+            else:
+                files.append((match, os.path.relpath(match, base)))
+
+    digest = hashlib.sha256()
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for path, arcname in files:
+            with open(path, "rb") as f:
+                data = f.read()
+            digest.update(arcname.encode() + b"\0" + data + b"\0")
+            info = tarfile.TarInfo(arcname)
+            info.size = len(data)
+            info.mode = os.stat(path).st_mode & 0o777
+            tar.addfile(info, io.BytesIO(data))
+    return digest.hexdigest(), buf.getvalue()
+
+async def docker_build(tag, context):
+    """`docker build -t tag -` with a tar build context on stdin."""
+    with docker_breaker.call():
+        proc = await asyncio.create_subprocess_exec(
+            "docker", "build", "-t", tag, "-",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, err = await asyncio.wait_for(proc.communicate(context), DOCKER_DEADLINES["build"])
+        except asyncio.TimeoutError:
+            proc.kill()
+            raise
+    if proc.returncode != 0:
+        lines = err.decode(errors="replace").strip().splitlines()
+        raise DockerAPIError(proc.returncode, lines[-1] if lines else "build failed")
+
+class TemplateCache:
+    """Reinstall templates built once per content hash and shared by every VPS.
+
+    A template's tag embeds the hash of its build context, so an unchanged
+    template is never rebuilt and an edited one gets a fresh tag. Concurrent
+    reinstalls of the same template wait on a single build.
+    """
+
+    NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+    def __init__(self, directory=TEMPLATE_DIR, repo=TEMPLATE_REPO):
+        self.directory = directory
+        self.repo = repo
+        self._building = {}  # tag -> build task
+
+    def path(self, name):
+        if not self.NAME.match(name):
+            return None
+        path = os.path.join(self.directory, f"{name}.Dockerfile")
+        return path if os.path.isfile(path) else None
+
+    async def image(self, name):
+        path = self.path(name)
+        if path is None:
+            raise FileNotFoundError(f"no template {name}")
+        digest, context = build_context(path)
+        tag = f"{self.repo}:{name.lower()}-{digest[:16]}"
+        if await docker_api.image(tag) is not None:
+            return tag
+        task = self._building.get(tag)
+        if task is None:
+            task = self._building[tag] = asyncio.ensure_future(docker_build(tag, context))
+            task.add_done_callback(lambda _t: self._building.pop(tag, None))
+        await asyncio.shield(task)
+        return tag
+
+templates = TemplateCache()
+
+class ImageNotReady(Exception):
+    pass
+
+class OSImage:
+    """One catalog entry: an OS users can pick and the image that provides it."""
+    __slots__ = ("key", "label", "description", "emoji", "tag", "dockerfile", "pull", "check",
+                 "state", "digest", "error")
+
+    def __init__(self, key, label, description, tag, dockerfile=None, pull=None,
+                 check="command -v tmate", emoji="🐧"):
+        self.key = key
+        self.label = label
+        self.description = description
+        self.emoji = emoji
+        self.tag = tag
+        self.dockerfile = dockerfile  # built from this file when the tag is missing...
+        self.pull = pull              # ...or pulled from this reference
+        self.check = check            # shell check run in a throwaway container before going ready
+        self.state = "pending"        # pending / building / ready / failed
+        self.digest = None            # image id pinned when the entry became ready
+        self.error = None
+
+    @property
+    def ref(self):
+        """What containers are created from: the pinned id once ready."""
+        return self.digest or self.tag
+
+# Declarative OS list; OSSelectView, deploy and the warm pool all read it
+OS_IMAGES = [
+    OSImage("ubuntu", "Ubuntu 22.04", "Latest LTS Ubuntu release", "ubuntu-22.04-with-tmate", dockerfile="Dockerfile"),
+    OSImage("debian", "Debian 12", "Stable Debian release", "debian-with-tmate", dockerfile="Dockerfile.debian"),
+]
+
+class ImageCatalog:
+    """Builds or verifies every catalog image in the background and pins its id.
+
+    An entry becomes ready only once its image exists locally and its
+    readiness check passed; deploys of anything else are refused with
+    ImageNotReady instead of paying a build or pull on the user's time.
+    Pinned ids are kept in the registry meta table so a changed tag shows up
+    in the log on the next start.
+    """
+
+    def __init__(self, images):
+        self.images = {img.key: img for img in images}
+        self._task = None
+
+    def entries(self):
+        return list(self.images.values())
+
+    def get(self, key):
+        return self.images.get(key)
+
+    def by_tag(self, tag):
+        return next((img for img in self.images.values() if img.tag == tag), None)
+
+    def require(self, key):
+        img = self.images.get(key)
+        if img is None:
+            raise ImageNotReady(f"Unknown OS `{key}`.")
+        if img.state != "ready":
+            detail = f": {img.error}" if img.error else ""
+            raise ImageNotReady(f"{img.label} is not ready yet ({img.state}{detail}). Try again shortly.")
+        return img
+
+    async def _build(self, img):
+        _, context = build_context(img.dockerfile)
+        await docker_build(img.tag, context)
+
+    async def _check(self, img):
+        with docker_breaker.call():
+            proc = await asyncio.create_subprocess_exec(
+                "docker", "run", "--rm", "--entrypoint", "sh", img.ref, "-c", img.check,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            try:
+                await asyncio.wait_for(proc.wait(), DOCKER_DEADLINES["create"])
+            except asyncio.TimeoutError:
+                proc.kill()
+                raise
+        if proc.returncode != 0:
+            raise DockerAPIError(proc.returncode, f"readiness check `{img.check}` failed")
+
+    async def prepare_one(self, img):
+        img.state, img.error = "building", None
+        try:
+            info = await docker_api.image(img.tag)
+            if info is None:
+                if img.pull:
+                    await docker_api.pull(img.pull)
+                    info = await docker_api.image(img.pull)
+                else:
+                    await self._build(img)
+                    info = await docker_api.image(img.tag)
+            if info is None:
+                raise DockerAPIError(404, f"{img.tag} still missing after build")
+            img.digest = info["Id"]
+            if img.check:
+                await self._check(img)
+        except Exception as e:
+            # whatever went wrong, the entry must not stay "building"
+            img.state, img.error, img.digest = "failed", str(e) or type(e).__name__, None
+            print(f"Image catalog: {img.key} failed: {img.error}")
+            return
+        previous = registry.get_meta(f"image_pin:{img.key}")
+        if previous and previous != img.digest:
+            print(f"Image catalog: {img.tag} moved from {previous[:19]} to {img.digest[:19]}")
+        registry.set_meta(f"image_pin:{img.key}", img.digest)
+        img.state = "ready"
+
+    async def prepare(self):
+        # one at a time: parallel builds of systemd images mostly fight over the disk
+        for img in self.images.values():
+            if img.state != "ready":
+                await self.prepare_one(img)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.prepare())
+
+catalog = ImageCatalog(OS_IMAGES)
+
+WARM_POOL_TARGETS = {                  # image -> booted containers kept ready
+    "ubuntu-22.04-with-tmate": 2,
+    "debian-with-tmate": 1,
+}
+WARM_POOL_PAUSE = False                # pause idle pool containers (no pre-opened tmate session then)
+WARM_POOL_MEMORY = '2g'                # limits a pool container boots with, until it is claimed
+WARM_POOL_CPUS = 1
+WARM_POOL_REFILL_SECONDS = 30
+
+class PooledContainer:
+    __slots__ = ("name", "image", "ssh", "paused", "volume", "id")
+
+    def __init__(self, name, image, ssh=None, paused=False, volume=None, id=None):
+        self.name = name
+        self.id = id
+        self.image = image
+        self.volume = volume  # base name of its /root + /home volumes, recorded when claimed
+        self.ssh = ssh        # tmate line opened while warming, if the container was not paused
+        self.paused = paused
+
+class WarmPool:
+    """Already-booted VPS containers per image, handed out by deploy.
+
+    claim() renames the container, applies the requested limits with
+    `docker update` and returns it together with the tmate line opened when
+    it was warmed, so a deploy skips both the boot and the tmate handshake.
+    Docker labels are fixed at creation, so a claimed container keeps its
+    vps.pool label and has no vps.* labels of its own: claim() stores the
+    labels it should have had as a pool claim keyed by container id, which
+    labelled_servers() reads. The rename to a non-pool_ name is what takes
+    it out of the pool. prime() therefore only touches pool_* containers the
+    registry does not know, so a customer's VPS is never adopted or removed.
+    refill() tops every image back up to its target in the background.
+    """
+
+    LABEL = VpsRecord.LABEL_PREFIX + "pool"
+    PREFIX = "pool_"
+
+    def __init__(self, targets, pause=WARM_POOL_PAUSE):
+        self.targets = dict(targets)
+        self.pause = pause
+        self.ready = {image: [] for image in self.targets}
+        self._refilling = None
+
+    def counts(self):
+        return {image: len(self.ready.get(image, [])) for image in self.targets}
+
+    async def prime(self):
+        """Adopt pool containers left from a previous run; discard dead ones."""
+        owned = {rec.name for rec in registry.all()}
+        listed = await docker_api.containers(all=True, filters={"label": [self.LABEL]})
+        gone = set(registry.pool_claims()) - {c.get("Id") for c in listed}
+        if gone:
+            registry.drop_pool_claims(gone)
+        for c in listed:
+            name = (c.get("Names") or ["/"])[0].lstrip("/")
+            if not name.startswith(self.PREFIX) or name in owned:
+                continue  # claimed earlier: it is somebody's VPS now
+            image = (c.get("Labels") or {}).get(self.LABEL)
+            volume = next((m["Name"][:-len("-root")] for m in c.get("Mounts") or []
+                           if m.get("Destination") == "/root" and m.get("Name", "").endswith("-root")), None)
+            if image in self.ready and c.get("State") in ("running", "paused"):
+                if all(p.name != name for p in self.ready[image]):
+                    self.ready[image].append(PooledContainer(name, image, paused=c.get("State") == "paused",
+                                                             volume=volume, id=c.get("Id")))
+            else:
+                try:
+                    await docker_api.remove(name, force=True)
+                except DOCKER_ERRORS:
+                    pass
+                if volume:
+                    await remove_vps_volumes(volume)
+
+    async def _warm_one(self, img):
+        image = img.tag
+        name = f"{self.PREFIX}{img.key}_{generate_random_string(10).lower()}"
+        volume = await create_vps_volumes()
+        try:
+            cid = await docker_api.run(
+                name, img.ref, vps_host_config(WARM_POOL_MEMORY, WARM_POOL_CPUS, volume=volume),
+                Tty=True, OpenStdin=True, Labels={self.LABEL: image}
+            )
+        except DOCKER_ERRORS:
+            await remove_vps_volumes(volume)
+            raise
+        entry = PooledContainer(name, image, volume=volume, id=cid)
+        try:
+            if self.pause:
+                await docker_api.pause(name)
+                entry.paused = True
+            else:
+                entry.ssh = await tmate_session(name)
+        except DOCKER_ERRORS:
+            try:
+                await docker_api.remove(name, force=True)
+            except DOCKER_ERRORS:
+                pass
+            await remove_vps_volumes(volume)
+            raise
+        self.ready[image].append(entry)
+
+    async def refill(self):
+        for image, target in self.targets.items():
+            img = catalog.by_tag(image)
+            if img is None or img.state != "ready":
+                continue
+            while len(self.ready[image]) < target:
+                if not capacity.fits(parse_size(WARM_POOL_MEMORY), WARM_POOL_CPUS):
+                    return
+                try:
+                    await self._warm_one(img)
+                except DOCKER_ERRORS as e:
+                    print(f"Warm pool: could not prepare {image}: {e}")
+                    break
+
+    def kick(self):
+        """Start a background refill unless one is already running."""
+        if self._refilling is None or self._refilling.done():
+            self._refilling = asyncio.get_running_loop().create_task(self.refill())
+
+    async def _discard(self, entry, error):
+        print(f"Warm pool: dropping {entry.name}: {error}")
+        try:
+            await docker_api.remove(entry.name, force=True)
+        except DOCKER_ERRORS:
+            pass
+        if entry.volume:
+            await remove_vps_volumes(entry.volume)
+
+    async def _give_back(self, entry):
+        """Undo a claim that failed on the caller's side: pool limits, paused again, front of the line."""
+        try:
+            await docker_api.update(entry.name, memory=WARM_POOL_MEMORY, cpus=WARM_POOL_CPUS)
+            if entry.paused:
+                await docker_api.pause(entry.name)
+        except DOCKER_ERRORS as e:
+            await self._discard(entry, e)
+            return
+        self.ready[entry.image].insert(0, entry)
+
+    async def claim(self, image, new_name, memory, cpus, labels=None):
+        """Hand out a pooled container renamed to new_name, or None if none is usable.
+
+        labels are the vps.* labels the new VPS would have been created with;
+        they are kept as its pool claim.
+
+        A name that is already taken is the caller's mistake, not the pool's:
+        it raises DockerAPIError(409) and the container goes back into the pool.
+        """
+        if await docker_api.state(new_name) is not None:
+            raise DockerAPIError(409, f'Conflict. The container name "/{new_name}" is already in use')
+        ready = self.ready.get(image) or []
+        while ready:
+            entry = ready.pop(0)
+            try:
+                if entry.paused:
+                    await docker_api.unpause(entry.name)
+                await docker_api.update(entry.name, memory=memory, cpus=cpus)
+            except DOCKER_ERRORS as e:
+                await self._discard(entry, e)
+                continue
+            try:
+                await docker_api.rename(entry.name, new_name)
+            except DockerAPIError as e:
+                if e.status == 409:  # taken between the check and the rename
+                    await self._give_back(entry)
+                    raise
+                await self._discard(entry, e)
+                continue
+            except DOCKER_ERRORS as e:
+                await self._discard(entry, e)
+                continue
+            entry.name = new_name
+            if labels and entry.id:
+                registry.set_pool_claim(entry.id, labels)
+            self.kick()
+            return entry
+        self.kick()
+        return None
+
+warm_pool = WarmPool(WARM_POOL_TARGETS)
+
+MEMORY_OVERCOMMIT = 1.0  # committed VPS RAM may reach this multiple of host RAM
+CPU_OVERCOMMIT = 4.0     # ...and VPS cores this multiple of host cores
+ADMISSION_WAIT = 120     # seconds a deploy waits in line for capacity before it is rejected
+ADMISSION_POLL = 5
+
+def plan_memory_bytes(ram):
+    """Registry RAM field in bytes: bare numbers are GB (/deploy), otherwise '2g' / '2048m'."""
+    try:
+        return int(float(ram) * 1024 ** 3)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return parse_size(ram)
+    except (TypeError, ValueError):
+        return 0
+
+def record_limits(rec):
+    """HostConfig limits from a record's plan, for recreating a VPS whose container is gone."""
+    limits = {}
+    memory = plan_memory_bytes(rec.ram)
+    if memory:
+        limits["Memory"] = memory
+        limits["MemorySwap"] = memory + (plan_memory_bytes(rec.swap) if rec.swap else memory)
+    cpus = plan_cpus(rec.cpu)
+    if cpus:
+        limits["NanoCpus"] = int(cpus * 1e9)
+    if rec.pids:
+        limits["PidsLimit"] = int(rec.pids)
+    return limits
+
+def plan_cpus(cpu):
+    try:
+        return float(cpu)
+    except (TypeError, ValueError):
+        return 0.0
+
+class CapacityTracker:
+    """Node-wide admission of RAM and cores against the host, times an overcommit ratio.
+
+    Commitments are the plan limits of every VPS whose container is live
+    (running or paused; a paused container still holds its memory) plus
+    the warm pool. Like QuotaTracker, deploys that have been admitted but
+    not written yet are held as reservations, so two concurrent deploys
+    cannot both claim the last of the headroom.
+    """
+
+    LIVE = ("running", "paused", "restarting")
+
+    def __init__(self, memory_ratio=MEMORY_OVERCOMMIT, cpu_ratio=CPU_OVERCOMMIT):
+        self.memory_ratio = memory_ratio
+        self.cpu_ratio = cpu_ratio
+        self._pending = {}  # token -> (bytes, cpus)
+        self._next = 0
+
+    @staticmethod
+    def host():
+        """(RAM bytes, cores) of the node."""
+        memory = 0
+        try:
+            with open("/proc/meminfo") as f:
+                for line in f:
+                    if line.startswith("MemTotal:"):
+                        memory = int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+        return memory, os.cpu_count() or 1
+
+    def capacity(self):
+        memory, cpus = self.host()
+        return memory * self.memory_ratio, cpus * self.cpu_ratio
+
+    def committed(self):
+        host_memory, host_cpus = self.host()
+        memory, cpus = 0, 0.0
+        for rec in registry.all():
+            # without the event stream there is no state to go by; count everything
+            if state_cache.live:
+                st = state_cache.get(rec.name)
+                if st is None or st.status not in self.LIVE:
+                    continue
+            plan_memory = plan_memory_bytes(rec.ram)
+            if plan_memory > host_memory:
+                # a limit above the node's RAM limits nothing (old /deploy stored 16000 / 90000 GB);
+                # count what the container actually holds, or the whole node if unknown
+                series = stats_sampler.get(rec.name)
+                plan_memory = series.memory.last() if series and series.memory.count else host_memory
+            memory += plan_memory
+            cpus += min(plan_cpus(rec.cpu), host_cpus)
+        pooled = sum(warm_pool.counts().values())
+        memory += pooled * parse_size(WARM_POOL_MEMORY)
+        cpus += pooled * WARM_POOL_CPUS
+        for m, c in self._pending.values():
+            memory += m
+            cpus += c
+        return memory, cpus
+
+    def oversized(self):
+        """Records whose plan is bigger than the node itself; /resize brings them back in line."""
+        host_memory, host_cpus = self.host()
+        return [rec for rec in registry.all()
+                if plan_memory_bytes(rec.ram) > host_memory or plan_cpus(rec.cpu) > host_cpus]
+
+    def headroom(self):
+        cap_mem, cap_cpu = self.capacity()
+        used_mem, used_cpu = self.committed()
+        return cap_mem - used_mem, cap_cpu - used_cpu
+
+    def fits(self, memory, cpus):
+        free_mem, free_cpu = self.headroom()
+        return memory <= free_mem and cpus <= free_cpu
+
+    def could_ever_fit(self, memory, cpus):
+        """False for requests no amount of waiting admits: beyond capacity, or more cores than the host has."""
+        cap_mem, cap_cpu = self.capacity()
+        return memory <= cap_mem and cpus <= min(cap_cpu, self.host()[1])
+
+    def reserve(self, memory, cpus):
+        """Token holding (memory, cpus) until release(), or None if it does not fit now."""
+        if not self.fits(memory, cpus):
+            return None
+        self._next += 1
+        self._pending[self._next] = (memory, cpus)
+        return self._next
+
+    def release(self, token):
+        self._pending.pop(token, None)
+
+    async def admit(self, memory, cpus, wait=ADMISSION_WAIT):
+        """reserve(), retrying until capacity frees up (a VPS is stopped or deleted) or wait runs out."""
+        deadline = time.monotonic() + wait
+        while True:
+            token = self.reserve(memory, cpus)
+            if token is not None or not self.could_ever_fit(memory, cpus) or time.monotonic() >= deadline:
+                return token
+            await asyncio.sleep(ADMISSION_POLL)
+
+    def summary(self):
+        free_mem, free_cpu = self.headroom()
+        cap_mem, cap_cpu = self.capacity()
+        return (f"{format_bytes(max(free_mem, 0))} of {format_bytes(cap_mem)} RAM, "
+                f"{max(free_cpu, 0):g} of {cap_cpu:g} cores free "
+                f"(overcommit {self.memory_ratio:g}x RAM, {self.cpu_ratio:g}x CPU)")
+
+capacity = CapacityTracker()
+
+def capacity_embed(memory, cpus, queued=False):
+    if queued:
+        return discord.Embed(
+            title="⏳ Node At Capacity",
+            description=f"Waiting up to {ADMISSION_WAIT}s for room for {format_bytes(memory)} RAM / {cpus:g} CPU.\n"
+                        f"**Free:** {capacity.summary()}",
+            color=0xffaa00
+        )
+    return discord.Embed(
+        title="❌ Not Enough Capacity",
+        description=f"This node cannot fit {format_bytes(memory)} RAM / {cpus:g} CPU right now.\n"
+                    f"**Free:** {capacity.summary()}",
+        color=0xff0000
+    )
+
+async def admit_deploy(send, memory, cpus):
+    """Capacity token for a deploy, queueing it while the node is full; tells the caller via send()."""
+    token = capacity.reserve(memory, cpus)
+    if token is None and capacity.could_ever_fit(memory, cpus):
+        await send(embed=capacity_embed(memory, cpus, queued=True))
+        token = await capacity.admit(memory, cpus)
+    if token is None:
+        await send(embed=capacity_embed(memory, cpus))
+    return token
+
+def get_ssh_command_from_database(container_id):
+    rec = registry.get(container_id)
+    return rec.ssh if rec else None
 
 def get_user_servers(user):
-    if not os.path.exists(database_file):
-        return []
-    servers = []
-    with open(database_file, 'r') as f:
-        for line in f:
-            if line.startswith(user):
-                servers.append(line.strip())
-    return servers
+    return registry.by_owner(user)
 
 def count_user_servers(user):
-    return len(get_user_servers(user))
+    return registry.count(user)
 
 def get_container_id_from_database(user, container_name=None):
+    if container_name:
+        rec = registry.lookup(user, container_name)
+        return rec.name if rec else None
     servers = get_user_servers(user)
-    if servers:
-        if container_name:
-            for server in servers:
-                parts = server.split('|')
-                if len(parts) >= 2 and container_name in parts[1]:
-                    return parts[1]
-            return None
-        else:
-            return servers[0].split('|')[1]
-    return None
+    return servers[0].name if servers else None
 
 # OS Selection dropdown for deploy command
 # OS Selection dropdown for deploy command
@@ -200,12 +2550,17 @@ class OSSelectView(View):
         super().__init__(timeout=60)
         self.callback = callback
         
-        # Create the OS selection dropdown
+        # Create the OS selection dropdown from the image catalog
         select = Select(
             placeholder="Select an operating system",
             options=[
-                discord.SelectOption(label="Ubuntu 22.04", description="Latest LTS Ubuntu release", emoji="🐧", value="ubuntu"),
-                discord.SelectOption(label="Debian 12", description="Stable Debian release", emoji="🐧", value="debian")
+                discord.SelectOption(
+                    label=img.label,
+                    description=img.description if img.state == "ready" else f"⏳ Preparing image ({img.state})",
+                    emoji=img.emoji,
+                    value=img.key
+                )
+                for img in catalog.entries()
             ]
         )
         
@@ -235,30 +2590,16 @@ class ConfirmView(View):
             if self.is_delete_all:
                 # Delete all VPS instances
                 containers = get_all_containers()
-                deleted_count = 0
-                
-                for container_info in containers:
-                    parts = container_info.split('|')
-                    if len(parts) >= 2:
-                        container_id = parts[1]
-                        try:
-                            subprocess.run(["docker", "stop", container_id], check=True, stderr=subprocess.DEVNULL)
-                            subprocess.run(["docker", "rm", container_id], check=True, stderr=subprocess.DEVNULL)
-                            deleted_count += 1
-                        except Exception:
-                            pass
-                
-                # Clear the database file
-                with open(database_file, 'w') as f:
-                    f.write('')
-                    
-                embed = discord.Embed(
-                    title=" All VPS Instances Deleted",
-                    description=f"Successfully deleted {deleted_count} VPS instances.",
-                    color=0x00ff00
-                )
+                op = BulkOperation(" Deleting All VPS Instances", "destroy", (rec.name for rec in containers))
                 # Use followup instead of edit_message
-                await interaction.followup.send(embed=embed)
+                message = await interaction.followup.send(embed=op.embed(), wait=True)
+                await op.run(message)
+                
+                # Clear the registry for everything that is actually gone
+                for name in op.succeeded:
+                    remove_all_shares(name)
+                await remove_from_database(*op.succeeded)
+                await drop_volumes_of(*op.succeeded)
                 
                 # Disable all buttons
                 for child in self.children:
@@ -267,9 +2608,11 @@ class ConfirmView(View):
             else:
                 # Delete single VPS instance
                 try:
-                    subprocess.run(["docker", "stop", self.container_id], check=True, stderr=subprocess.DEVNULL)
-                    subprocess.run(["docker", "rm", self.container_id], check=True, stderr=subprocess.DEVNULL)
-                    remove_from_database(self.container_id)
+                    await docker_api.stop(self.container_id)
+                    await docker_api.remove(self.container_id)
+                    await remove_from_database(self.container_id)
+                    remove_all_shares(self.container_id)
+                    await drop_volumes_of(self.container_id)
                     
                     embed = discord.Embed(
                         title=" VPS Deleted",
@@ -318,11 +2661,7 @@ class ConfirmView(View):
 async def on_ready():
     async def update_status():
         while True:
-            try:
-                with open("database.txt", "r") as f:
-                    count = len([line for line in f if line.strip()])
-            except FileNotFoundError:
-                count = 0
+            count = registry.count()
 
             await bot.change_presence(
                 activity=discord.Activity(
@@ -340,17 +2679,82 @@ async def on_ready():
         print(f"Failed to sync commands: {e}")
 
     bot.loop.create_task(update_status())
+    if not compact_registry.is_running():
+        compact_registry.start()
+    state_cache.start()
+    catalog.start()
+    if not retry_images.is_running():
+        retry_images.start()
+    if not measure_volumes.is_running():
+        measure_volumes.start()
+    if registry.count() == 0:
+        try:
+            restored = await rebuild_registry_from_labels()
+            if restored:
+                print(f"Restored {restored} VPS record(s) from container labels")
+        except DOCKER_ERRORS as e:
+            print(f"Could not rebuild registry from labels: {e}")
+    if cgroups.available and not sample_stats.is_running():
+        sample_stats.start()
+    if not refill_warm_pool.is_running():
+        refill_warm_pool.start()
     print(f"✅ Bot Ready: {bot.user}")
     
+@tasks.loop(seconds=SAMPLE_INTERVAL)
+async def sample_stats():
+    try:
+        stats_sampler.sample()
+    except Exception as e:
+        print(f"Failed to sample container stats: {e}")
+
+@tasks.loop(minutes=10)
+async def measure_volumes():
+    rows = registry.all_volumes()
+    if not rows:
+        return
+    try:
+        sizes = await docker_api.volume_usage()
+    except DOCKER_ERRORS as e:
+        print(f"Failed to measure VPS volumes: {e}")
+        return
+    # the registry records the base name; Docker measures <base>-root and <base>-home
+    usage = {}
+    for _, base in rows:
+        parts = [sizes.get(vol, -1) for vol in volume_names(base)]
+        if any(size >= 0 for size in parts):
+            usage[base] = sum(size for size in parts if size >= 0)
+    updated = registry.set_volume_usage(usage)
+    if updated != len(usage):
+        print(f"Volume usage: measured {len(usage)} VPS volume pairs but recorded {updated}")
+
+@tasks.loop(minutes=10)
+async def retry_images():
+    # entries that failed (no network, bad build) get another try; ready ones are skipped
+    if any(img.state == "failed" for img in catalog.entries()):
+        catalog.start()
+
+@tasks.loop(seconds=WARM_POOL_REFILL_SECONDS)
+async def refill_warm_pool():
+    warm_pool.kick()
+
+@refill_warm_pool.before_loop
+async def prime_warm_pool():
+    try:
+        await warm_pool.prime()
+    except DOCKER_ERRORS as e:
+        print(f"Warm pool: could not adopt existing containers: {e}")
+
+@tasks.loop(seconds=60)
+async def compact_registry():
+    try:
+        registry.maybe_compact()
+    except Exception as e:
+        print(f"Failed to compact registry journal: {e}")
+
 @tasks.loop(seconds=5)
 async def change_status():
     try:
-        if os.path.exists(database_file):
-            with open(database_file, 'r') as f:
-                lines = f.readlines()
-                instance_count = len(lines)
-        else:
-            instance_count = 0
+        instance_count = registry.count()
 
         status = f"with {instance_count} Cloud Instances 🌐"
         await bot.change_presence(activity=discord.Game(name=status))
@@ -371,7 +2775,8 @@ async def nodedmin(interaction: discord.Interaction):
     # Use defer to handle potentially longer processing time
     await interaction.response.defer()
 
-    if not os.path.exists(database_file):
+    records = get_all_containers()
+    if not records:
         embed = discord.Embed(
             title="VPS Instances",
             description="No VPS data available.",
@@ -386,17 +2791,13 @@ async def nodedmin(interaction: discord.Interaction):
         color=0x00aaff
     )
     
-    with open(database_file, 'r') as f:
-        lines = f.readlines()
-    
     # If there are too many instances, we might need multiple embeds
     embeds = []
     current_embed = embed
     field_count = 0
+    snap = await stats_collector.snapshot()
     
-    for line in lines:
-        parts = line.strip().split('|')
-        
+    for rec in records:
         # Check if we need a new embed (Discord has a 25 field limit per embed)
         if field_count >= 25:
             embeds.append(current_embed)
@@ -407,32 +2808,26 @@ async def nodedmin(interaction: discord.Interaction):
             )
             field_count = 0
         
-        if len(parts) >= 8:
-            user, container_name, ssh_command, ram, cpu, creator, os_type, expiry = parts
-            stats = get_container_stats(container_name)
-            
+        stats = snap.get(rec.name)
+        if rec.os_type:
             current_embed.add_field(
-                name=f"🖥️ {container_name} ({stats['status']})",
-                value=f"🪩 **User:** {user}\n"
+                name=f"🖥️ {rec.name} ({stats['status']})",
+                value=f"🪩 **User:** {rec.owner}\n"
                       f"💾 **RAM:** 64GB\n"
                       f"🔥 **CPU:** 10 cores\n"
-                      f"🌐 **OS:** {os_type}\n"
-                      f"👑 **Creator:** {creator}\n"
-                      f"🔑 **SSH:** `{ssh_command}`",
+                      f"🌐 **OS:** {rec.os_type}\n"
+                      f"👑 **Creator:** {rec.creator or rec.owner}\n"
+                      f"🔑 **SSH:** `{rec.ssh or 'N/A'}`",
                 inline=False
             )
-            field_count += 1
-        elif len(parts) >= 3:
-            user, container_name, ssh_command = parts
-            stats = get_container_stats(container_name)
-            
+        else:
             current_embed.add_field(
-                name=f"🖥️ {container_name} ({stats['status']})",
-                value=f"👤 **User:** {user}\n"
-                      f"🔑 **SSH:** `{ssh_command}`",
+                name=f"🖥️ {rec.name} ({stats['status']})",
+                value=f"👤 **User:** {rec.owner}\n"
+                      f"🔑 **SSH:** `{rec.ssh or 'N/A'}`",
                 inline=False
             )
-            field_count += 1
+        field_count += 1
     
     # Add the last embed if it has fields
     if field_count > 0:
@@ -477,16 +2872,14 @@ async def node_stats(interaction: discord.Interaction):
         inline=False
     )
     
-    for container_info in containers:
-        parts = container_info.split('|')
-        if len(parts) >= 2:
-            container_id = parts[1]
-            stats = get_container_stats(container_id)
-            embed.add_field(
-                name=f"{container_id}",
-                value=f"Status: {stats['status']}\nMemory: 64gb\nCPU: 10",
-                inline=True
-            )
+    snap = await stats_collector.snapshot()
+    for rec in containers:
+        stats = snap.get(rec.name)
+        embed.add_field(
+            name=f"{rec.name}",
+            value=f"Status: {stats['status']}\nMemory: {stats['memory']}\nCPU: {stats['cpu']}",
+            inline=True
+        )
     
     await interaction.followup.send(embed=embed)
 
@@ -504,9 +2897,8 @@ async def regen_ssh_command(interaction: discord.Interaction, container_name: st
         return
 
     try:
-        exec_cmd = await asyncio.create_subprocess_exec("docker", "exec", container_id, "tmate", "-F",
-                                                        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-    except subprocess.CalledProcessError as e:
+        ssh_session_line = await tmate_session(container_id)
+    except DOCKER_ERRORS as e:
         embed = discord.Embed(
             title="❌ Error",
             description=f"Error executing tmate in Docker container: {e}",
@@ -515,21 +2907,9 @@ async def regen_ssh_command(interaction: discord.Interaction, container_name: st
         await interaction.response.send_message(embed=embed)
         return
 
-    ssh_session_line = await capture_ssh_session_line(exec_cmd)
     if ssh_session_line:
         # Update SSH command in database
-        if os.path.exists(database_file):
-            with open(database_file, 'r') as f:
-                lines = f.readlines()
-            with open(database_file, 'w') as f:
-                for line in lines:
-                    if container_id in line:
-                        parts = line.strip().split('|')
-                        if len(parts) >= 3:
-                            parts[2] = ssh_session_line
-                            f.write('|'.join(parts) + '\n')
-                    else:
-                        f.write(line)
+        await update_ssh_command(container_id, ssh_session_line)
         
         # Send DM with new SSH command
         dm_embed = discord.Embed(
@@ -575,25 +2955,12 @@ async def start_server(interaction: discord.Interaction, container_name: str):
     await interaction.response.defer()
 
     try:
-        subprocess.run(["docker", "start", container_id], check=True)
-        exec_cmd = await asyncio.create_subprocess_exec("docker", "exec", container_id, "tmate", "-F",
-                                                        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-        ssh_session_line = await capture_ssh_session_line(exec_cmd)
+        await docker_api.start(container_id)
+        ssh_session_line = await tmate_session(container_id)
         
         if ssh_session_line:
             # Update SSH command in database
-            if os.path.exists(database_file):
-                with open(database_file, 'r') as f:
-                    lines = f.readlines()
-                with open(database_file, 'w') as f:
-                    for line in lines:
-                        if container_id in line:
-                            parts = line.strip().split('|')
-                            if len(parts) >= 3:
-                                parts[2] = ssh_session_line
-                                f.write('|'.join(parts) + '\n')
-                        else:
-                            f.write(line)
+            await update_ssh_command(container_id, ssh_session_line)
             
             # Send DM with SSH command
             dm_embed = discord.Embed(
@@ -637,7 +3004,7 @@ async def start_server(interaction: discord.Interaction, container_name: str):
                 color=0xffaa00
             )
             await interaction.followup.send(embed=error_embed)
-    except subprocess.CalledProcessError as e:
+    except DOCKER_ERRORS as e:
         error_embed = discord.Embed(
             title="❌ Error",
             description=f"Error starting VPS instance: {e}",
@@ -661,14 +3028,14 @@ async def stop_server(interaction: discord.Interaction, container_name: str):
     await interaction.response.defer()
 
     try:
-        subprocess.run(["docker", "stop", container_id], check=True)
+        await docker_api.stop(container_id)
         success_embed = discord.Embed(
             title="⏹️ VPS Stopped",
             description=f"Your VPS instance `{container_name}` has been stopped. You can start it again with `/start {container_name}`",
             color=0x00ff00
         )
         await interaction.followup.send(embed=success_embed)
-    except subprocess.CalledProcessError as e:
+    except DOCKER_ERRORS as e:
         error_embed = discord.Embed(
             title="❌ Error",
             description=f"Failed to stop VPS instance: {str(e)}",
@@ -692,25 +3059,12 @@ async def restart_server(interaction: discord.Interaction, container_name: str):
     await interaction.response.defer()
 
     try:
-        subprocess.run(["docker", "restart", container_id], check=True)
-        exec_cmd = await asyncio.create_subprocess_exec("docker", "exec", container_id, "tmate", "-F",
-                                                        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-        ssh_session_line = await capture_ssh_session_line(exec_cmd)
+        await docker_api.restart(container_id)
+        ssh_session_line = await tmate_session(container_id)
         
         if ssh_session_line:
             # Update SSH command in database
-            if os.path.exists(database_file):
-                with open(database_file, 'r') as f:
-                    lines = f.readlines()
-                with open(database_file, 'w') as f:
-                    for line in lines:
-                        if container_id in line:
-                            parts = line.strip().split('|')
-                            if len(parts) >= 3:
-                                parts[2] = ssh_session_line
-                                f.write('|'.join(parts) + '\n')
-                        else:
-                            f.write(line)
+            await update_ssh_command(container_id, ssh_session_line)
             
             # Send DM with SSH command
             dm_embed = discord.Embed(
@@ -754,7 +3108,7 @@ async def restart_server(interaction: discord.Interaction, container_name: str):
                 color=0xffaa00
             )
             await interaction.followup.send(embed=error_embed)
-    except subprocess.CalledProcessError as e:
+    except DOCKER_ERRORS as e:
         error_embed = discord.Embed(
             title="❌ Error",
             description=f"Error restarting VPS instance: {e}",
@@ -762,16 +3116,6 @@ async def restart_server(interaction: discord.Interaction, container_name: str):
         )
         await interaction.followup.send(embed=error_embed)
 
-async def capture_output(process, keyword):
-    while True:
-        output = await process.stdout.readline()
-        if not output:
-            break
-        output = output.decode('utf-8').strip()
-        if keyword in output:
-            return output
-    return None
-
 @bot.tree.command(name="port-add", description="🔌 Adds a port forwarding rule")
 @app_commands.describe(container_name="The name of the container", container_port="The port in the container")
 async def port_add(interaction: discord.Interaction, container_name: str, container_port: int):
@@ -784,16 +3128,14 @@ async def port_add(interaction: discord.Interaction, container_name: str, contai
 
     public_port = generate_random_port()
 
-    # Set up port forwarding inside the container
-    command = f"ssh -o StrictHostKeyChecking=no -R {public_port}:localhost:{container_port} serveo.net -N -f"
+    # Set up port forwarding inside the container; ssh -f backgrounds itself once the
+    # tunnel is up, and the redirect lets the exec stream close when it does
+    command = f"ssh -o StrictHostKeyChecking=no -R {public_port}:localhost:{container_port} serveo.net -N -f >/dev/null 2>&1"
 
     try:
-        # Run the command in the background using Docker exec
-        await asyncio.create_subprocess_exec(
-            "docker", "exec", container_name, "bash", "-c", command,
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL
-        )
+        exit_code, _ = await docker_api.exec_run(container_name, ["bash", "-c", command])
+        if exit_code != 0:
+            raise DockerAPIError(exit_code, "ssh could not open the tunnel")
 
         # Respond with the port and public IP
         success_embed = discord.Embed(
@@ -827,11 +3169,11 @@ async def port_forward_website(interaction: discord.Interaction, container_name:
     await interaction.response.send_message(embed=embed)
     
     try:
-        exec_cmd = await asyncio.create_subprocess_exec(
-            "docker", "exec", container_name, "ssh", "-o", "StrictHostKeyChecking=no", "-R", f"80:localhost:{container_port}", "serveo.net",
-            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        url_line = await exec_until(
+            container_name,
+            ["ssh", "-o", "StrictHostKeyChecking=no", "-R", f"80:localhost:{container_port}", "serveo.net"],
+            "Forwarding HTTP traffic from", 60
         )
-        url_line = await capture_output(exec_cmd, "Forwarding HTTP traffic from")
         
         if url_line:
             url = url_line.split(" ")[-1]
@@ -862,22 +3204,22 @@ async def port_forward_website(interaction: discord.Interaction, container_name:
 
 @bot.tree.command(name="deploy", description="🚀 Admin: Deploy a new VPS instance")
 @app_commands.describe(
-    ram="RAM allocation in GB (max 16gb)",
-    cpu="CPU cores (max 24)",
+    ram="RAM allocation in GB",
+    cpu="CPU cores",
     target_user="Discord user ID to assign the VPS to",
     container_name="Custom container name (default: auto-generated)",
     expiry="Time until expiry (e.g. 1d, 2h, 30m, 45s, 1y, 3M)"
 )
 async def deploy(
     interaction: discord.Interaction, 
-    ram: int = 16000, 
-    cpu: int = 40, 
+    ram: int = 16, 
+    cpu: int = 4, 
     target_user: str = None,
     container_name: str = None,
     expiry: str = None
 ):
     # Check if user is admin
-    if interaction.user.id not in ADMIN_IDS:
+    if not is_admin(interaction.user.id):
         embed = discord.Embed(
             title="❌ Access Denied",
             description="You don't have permission to use this command.",
@@ -887,14 +3229,20 @@ async def deploy(
         return
     
     # Validate parameters
-    if ram > 16000:
-        ram = 90000
-    if cpu > 40:
-        cpu = 90
+    if ram < 1 or cpu < 1:
+        await interaction.response.send_message("❌ RAM and CPU must be at least 1.", ephemeral=True)
+        return
+    if not capacity.could_ever_fit(ram * 1024 ** 3, cpu):
+        await interaction.response.send_message(embed=capacity_embed(ram * 1024 ** 3, cpu), ephemeral=True)
+        return
     
     # Set target user
     user_id = target_user if target_user else str(interaction.user.id)
     user = target_user if target_user else str(interaction.user)
+
+    if not quota.has_room(user):
+        await interaction.response.send_message(embed=quota_exceeded_embed(user), ephemeral=True)
+        return
     
     # Generate container name if not provided
     if not container_name:
@@ -919,7 +3267,56 @@ async def deploy(
     view = OSSelectView(os_selected_callback)
     await interaction.response.send_message(embed=embed, view=view)
 
+async def resize_vps(rec, ram=None, cpu=None, swap=None, pids=None):
+    """Move a VPS to a new plan in place: `docker update` the live limits, then rewrite its row.
+
+    ram and swap are in GB like /deploy; anything left as None keeps its current value
+    (except swap, which follows ram back to Docker's default when ram changes alone).
+    The cached record is left alone; the updated copy is returned once it is written.
+    """
+    await docker_api.update(
+        rec.name,
+        memory=f"{ram}g" if ram is not None else None,
+        cpus=cpu,
+        swap=f"{swap}g" if swap is not None and ram is not None else None,
+        pids=pids,
+    )
+    rec = VpsRecord.parse(rec.to_line())
+    if ram is not None:
+        rec.ram = ram
+        rec.swap = swap
+    if cpu is not None:
+        rec.cpu = cpu
+    if pids is not None:
+        rec.pids = pids
+    await add_record(rec)
+    return rec
+
+def image_not_ready_embed(error):
+    return discord.Embed(title="⏳ OS Image Not Ready", description=str(error), color=0xffaa00)
+
 async def deploy_with_os(interaction, os_type, ram, cpu, user_id, user, container_name, expiry_date):
+    try:
+        catalog.require(os_type)
+    except ImageNotReady as e:
+        await interaction.followup.send(embed=image_not_ready_embed(e))
+        return
+    # Admission runs before anything is spawned; the slot is held until the row is written
+    if not quota.reserve(user):
+        await interaction.followup.send(embed=quota_exceeded_embed(user))
+        return
+    try:
+        token = await admit_deploy(interaction.followup.send, ram * 1024 ** 3, cpu)
+        if token is None:
+            return
+        try:
+            await _deploy_with_os(interaction, os_type, ram, cpu, user_id, user, container_name, expiry_date)
+        finally:
+            capacity.release(token)
+    finally:
+        quota.release(user)
+
+async def _deploy_with_os(interaction, os_type, ram, cpu, user_id, user, container_name, expiry_date):
     # Prepare response
     embed = discord.Embed(
         title="**🛠️ Creating VPS**",
@@ -932,21 +3329,29 @@ async def deploy_with_os(interaction, os_type, ram, cpu, user_id, user, containe
     )
     await interaction.followup.send(embed=embed)
     
-    # Select image based on OS type
-    image = get_docker_image_for_os(os_type)
+    # Select image based on OS type; containers are created from the pinned id
+    img = catalog.require(os_type)
+    image = img.tag
+    rec = VpsRecord(
+        user, container_name, ram=ram, cpu=cpu, creator=str(interaction.user),
+        os_type=os_type_to_display_name(os_type), expiry=expiry_date, created=time.time()
+    )
     
+    pooled = volume = None
     try:
-        # Create container with resource limits
-        container_id = subprocess.check_output([
-            "docker", "run", "-itd", 
-            "--privileged", 
-            "--cap-add=ALL",
-            f"--memory={ram}g",
-            f"--cpus={cpu}",
-            "--name", container_name,
-            image
-        ]).strip().decode('utf-8')
-    except subprocess.CalledProcessError as e:
+        pooled = await warm_pool.claim(image, container_name, f"{ram}g", cpu, rec.labels())
+        if pooled is not None:
+            volume = pooled.volume
+        else:
+            volume = await create_vps_volumes()
+            # Create container with resource limits (docker run -itd --privileged --cap-add=ALL)
+            await docker_api.run(
+                container_name, img.ref, vps_host_config(f"{ram}g", cpu, volume=volume),
+                Tty=True, OpenStdin=True, Labels=rec.labels()
+            )
+    except DOCKER_ERRORS as e:
+        if volume:
+            await remove_vps_volumes(volume)
         error_embed = discord.Embed(
             title="❌ Error",
             description=f"Error creating Docker container: {e}",
@@ -956,8 +3361,7 @@ async def deploy_with_os(interaction, os_type, ram, cpu, user_id, user, containe
         return
 
     try:
-        exec_cmd = await asyncio.create_subprocess_exec("docker", "exec", container_name, "tmate", "-F",
-                                                        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        ssh_session_line = pooled.ssh if pooled and pooled.ssh else await tmate_session(container_name)
     except Exception as e:
         error_embed = discord.Embed(
             title="❌ Error",
@@ -967,23 +3371,20 @@ async def deploy_with_os(interaction, os_type, ram, cpu, user_id, user, containe
         await interaction.followup.send(embed=error_embed)
         
         # Clean up container
-        subprocess.run(["docker", "stop", container_name], check=False)
-        subprocess.run(["docker", "rm", container_name], check=False)
+        try:
+            await docker_api.remove(container_name, force=True)
+        except DOCKER_ERRORS:
+            pass
+        if volume:
+            await remove_vps_volumes(volume)
         return
 
-    ssh_session_line = await capture_ssh_session_line(exec_cmd)
     if ssh_session_line:
         # Add to database with extended information
-        add_to_database(
-            user, 
-            container_name, 
-            ssh_session_line, 
-            ram_limit=ram, 
-            cpu_limit=cpu, 
-            creator=str(interaction.user),
-            expiry=expiry_date,
-            os_type=os_type_to_display_name(os_type)
-        )
+        rec.ssh = ssh_session_line
+        await add_record(rec)
+        if volume:
+            registry.set_volume(container_name, volume, volume_size_bytes(rec.disk))
         
         # Create a DM embed with detailed information
         dm_embed = discord.Embed(
@@ -1027,10 +3428,11 @@ async def deploy_with_os(interaction, os_type, ram, cpu, user_id, user, containe
     else:
         # Clean up container if SSH session couldn't be established
         try:
-            subprocess.run(["docker", "stop", container_name], check=False)
-            subprocess.run(["docker", "rm", container_name], check=False)
-        except Exception:
+            await docker_api.remove(container_name, force=True)
+        except DOCKER_ERRORS:
             pass
+        if volume:
+            await remove_vps_volumes(volume)
         
         error_embed = discord.Embed(
             title="❌ Deployment Failed",
@@ -1041,19 +3443,13 @@ async def deploy_with_os(interaction, os_type, ram, cpu, user_id, user, containe
 
 def os_type_to_display_name(os_type):
     """Convert OS type to display name"""
-    os_map = {
-        "ubuntu": "Ubuntu 22.04",
-        "debian": "Debian 12"
-    }
-    return os_map.get(os_type, "Unknown OS")
+    img = catalog.get(os_type)
+    return img.label if img else "Unknown OS"
 
 def get_docker_image_for_os(os_type):
     """Get Docker image name for OS type"""
-    os_map = {
-        "ubuntu": "ubuntu-22.04-with-tmate",
-        "debian": "debian-with-tmate"
-    }
-    return os_map.get(os_type, "ubuntu-22.04-with-tmate")
+    img = catalog.get(os_type) or catalog.get("ubuntu")
+    return img.tag
 
 # Tips navigation view
 class TipsView(View):
@@ -1153,7 +3549,7 @@ async def delete_server(interaction: discord.Interaction, container_name: str):
 @bot.tree.command(name="delete-all", description="🗑️ Admin: Delete all VPS instances")
 async def delete_all_servers(interaction: discord.Interaction):
     # Check if user is admin
-    if interaction.user.id not in ADMIN_IDS:
+    if not is_admin(interaction.user.id):
         embed = discord.Embed(
             title="**❌ Access Denied**",
             description="**You don't have permission to use this command.**",
@@ -1197,29 +3593,24 @@ async def list_servers(interaction: discord.Interaction):
         color=0x00aaff
     )
 
-    for server in servers:
-        parts = server.split('|')
-        container_id = parts[1]
+    snap = await stats_collector.snapshot()
+    for rec in servers:
+        container_id = rec.name
         
-        # Get container status
-        try:
-            container_info = subprocess.check_output(["docker", "inspect", "--format", "{{.State.Status}}", container_id]).decode().strip()
-            status = "🟢 Running" if container_info == "running" else "🔴 Stopped"
-        except:
-            status = "🔴 Stopped"
+        stats = snap.get(container_id)
+        status = stats["status"]
         
         # Get resource limits and other details
-        if len(parts) >= 8:
-            ram_limit, cpu_limit, creator, os_type, expiry = parts[3], parts[4], parts[5], parts[6], parts[7]
-            
+        if rec.creator:
             embed.add_field(
                 name=f"🖥️ {container_id} ({status})",
                 value=f"💾 **RAM:** 64GB\n"
                       f"🔥 **CPU:** 10 cores\n"
                       f"💾 **Storage:** 190 GB\n"
-                      f" 🧊**OS:** {os_type}\n"
-                      f"👑 **Created by:** {creator}\n"
-                      f"⏱️ **Expires:** {expiry}",
+                      f"📈 **Usage:** {stats['memory']} RAM, {stats['cpu']} CPU\n"
+                      f" 🧊**OS:** {rec.os_type}\n"
+                      f"👑 **Created by:** {rec.creator}\n"
+                      f"⏱️ **Expires:** {rec.expiry or 'None'}",
                 inline=False
             )
         else:
@@ -1228,6 +3619,7 @@ async def list_servers(interaction: discord.Interaction):
                 value=f"💾 **RAM:** 64gbGB\n"
                       f"🔥 **CPU:** 10 core\n"
                       f"💾 **Storage:** 190 GB\n"
+                      f"📈 **Usage:** {stats['memory']} RAM, {stats['cpu']} CPU\n"
                       f"🧊 **OS:** Ubuntu 22.04",
                 inline=False
             )
@@ -1254,6 +3646,15 @@ async def stop(interaction: discord.Interaction, container_name: str):
 async def restart(interaction: discord.Interaction, container_name: str):
     await restart_server(interaction, container_name)
 
+@start.autocomplete("container_name")
+@stop.autocomplete("container_name")
+@restart.autocomplete("container_name")
+@regen_ssh.autocomplete("container_name")
+@delete_server.autocomplete("container_name")
+async def owned_container_autocomplete(interaction: discord.Interaction, current: str):
+    names = registry.search(current, owner=str(interaction.user))
+    return [app_commands.Choice(name=name, value=name) for name in names]
+
 @bot.tree.command(name="ping", description="🏓 Check the bot's latency")
 async def ping(interaction: discord.Interaction):
     latency = round(bot.latency * 1000)
@@ -1292,7 +3693,7 @@ async def help_command(interaction: discord.Interaction):
     # Note: /botinfo is listed but not implemented; consider removing or implementing it
     
     # Admin commands
-    if interaction.user.id in ADMIN_IDS:
+    if is_admin(interaction.user.id):
         embed.add_field(
             name="👑 Admin Commands",
             value="Commands available only to admins:",
@@ -1307,6 +3708,8 @@ async def help_command(interaction: discord.Interaction):
         embed.add_field(name="/sendvps", value="Send VPS details to a user via DM", inline=True)
         embed.add_field(name="/sharedipv4 <container_name> <usertag>", value="Setup port forward in VPS and DM SSH info", inline=True)
         embed.add_field(name="/reinstall <usertag> <os>", value="Reinstall a user's VPS with selected OS", inline=True)
+        embed.add_field(name="/rebuild-registry", value="Restore missing VPS records from container labels", inline=True)
+        embed.add_field(name="/resize <container_name> [ram] [cpu] [swap] [pids]", value="Change a VPS's limits live, without a restart", inline=True)
     
     await interaction.response.send_message(embed=embed)
 
@@ -1314,44 +3717,95 @@ ACCESS_FILE = "access.txt"
 SHARE_LIMIT = 3
 
 # === Access Sharing ===
+class AccessControl:
+    """container -> shared user ids, held in memory and persisted row by row.
+
+    The shares table is read once; grants and revokes update the maps and
+    write a single row, so access checks never touch the database.
+    """
+
+    def __init__(self, registry, limit):
+        self.registry = registry
+        self.limit = limit
+        self._shares = None  # container_name -> {user_id: None}, grant ordered
+        self._by_user = {}   # user_id -> set(container_name)
+
+    def _load(self):
+        if self._shares is None:
+            self._shares = {}
+            self._by_user = {}
+            for cname, uid in self.registry.all_shares():
+                self._shares.setdefault(cname, {})[uid] = None
+                self._by_user.setdefault(uid, set()).add(cname)
+        return self._shares
+
+    def users(self, container_name):
+        return list(self._load().get(container_name, ()))
+
+    def shared_with(self, user_id):
+        self._load()
+        return sorted(self._by_user.get(str(user_id), ()))
+
+    def grant(self, container_name, user_id):
+        """Share container_name with user_id; False if already shared or at the limit."""
+        uid = str(user_id)
+        users = self._load().get(container_name, {})
+        if uid in users or len(users) >= self.limit:
+            return False
+        self.registry.add_share(container_name, uid)
+        self._shares.setdefault(container_name, users)[uid] = None
+        self._by_user.setdefault(uid, set()).add(container_name)
+        return True
+
+    def revoke(self, container_name, user_id):
+        uid = str(user_id)
+        users = self._load().get(container_name)
+        if not users or uid not in users:
+            return
+        self.registry.remove_share(container_name, uid)
+        del users[uid]
+        if not users:
+            del self._shares[container_name]
+        self._drop_user(uid, container_name)
+
+    def revoke_all(self, container_name):
+        users = self._load().pop(container_name, None)
+        if not users:
+            return
+        self.registry.remove_shares(container_name)
+        for uid in users:
+            self._drop_user(uid, container_name)
+
+    def _drop_user(self, uid, container_name):
+        names = self._by_user.get(uid)
+        if names is not None:
+            names.discard(container_name)
+            if not names:
+                del self._by_user[uid]
+
+    def has_access(self, user_id, container_name):
+        uid = str(user_id)
+        rec = self.registry.get(container_name)
+        if rec is not None and rec.owner == uid:
+            return True
+        return uid in self._load().get(container_name, ())
+
+acl = AccessControl(registry, SHARE_LIMIT)
+
 def get_shared_users(container_name):
-    if not os.path.exists(ACCESS_FILE):
-        return []
-    with open(ACCESS_FILE, 'r') as f:
-        return [line.split('|')[1].strip() for line in f if line.startswith(container_name + "|")]
+    return acl.users(container_name)
 
 def add_shared_user(container_name, user_id):
-    users = get_shared_users(container_name)
-    if str(user_id) not in users and len(users) < SHARE_LIMIT:
-        with open(ACCESS_FILE, 'a') as f:
-            f.write(f"{container_name}|{user_id}\n")
+    return acl.grant(container_name, user_id)
 
 def remove_shared_user(container_name, user_id):
-    if not os.path.exists(ACCESS_FILE):
-        return
-    with open(ACCESS_FILE, 'r') as f:
-        lines = f.readlines()
-    with open(ACCESS_FILE, 'w') as f:
-        for line in lines:
-            if line.strip() != f"{container_name}|{user_id}":
-                f.write(line)
+    acl.revoke(container_name, user_id)
 
 def remove_all_shares(container_name):
-    if not os.path.exists(ACCESS_FILE):
-        return
-    with open(ACCESS_FILE, 'r') as f:
-        lines = f.readlines()
-    with open(ACCESS_FILE, 'w') as f:
-        for line in lines:
-            if not line.startswith(container_name + "|"):
-                f.write(line)
+    acl.revoke_all(container_name)
 
 def has_access(user_id, container_name):
-    servers = get_user_servers(str(user_id))  # define yourself
-    for line in servers:
-        if container_name in line:
-            return True
-    return str(user_id) in get_shared_users(container_name)
+    return acl.has_access(user_id, container_name)
 
 # === Invite / Boost Verification ===
 async def has_required_invites(user: discord.User, required: int):
@@ -1374,20 +3828,27 @@ def display_shared_users(users):
     return "\n".join(f"<@{uid}>" for uid in users)
 
 # === /create Command ===
+REWARD_PLANS = {  # value -> (label, RAM in GB, CPU cores)
+    "invite_8": ("🎉 Invite: 3 Invites = 32gbB", 32, 4),
+    "invite_15": ("🎉 Invite: 8 Invites = 64GB", 64, 8),
+    "boost_1": ("🚀 Boost: 1 Boost = 32GB", 32, 4),
+    "boost_2": ("🚀 Boost: 2 Boost = 64GB", 64, 8),
+}
+
+def available_reward_plans():
+    """Reward plans this node could ever host; bigger ones are not offered at all."""
+    return {value: plan for value, plan in REWARD_PLANS.items()
+            if capacity.could_ever_fit(plan[1] * 1024 ** 3, plan[2])}
+
 class RewardSelect(discord.ui.Select):
     def __init__(self):
-        options = [
-            discord.SelectOption(label="🎉 Invite: 3 Invites = 32gbB", value="invite_8"),
-            discord.SelectOption(label="🎉 Invite: 8 Invites = 64GB", value="invite_15"),
-            discord.SelectOption(label="🚀 Boost: 1 Boost = 32GB", value="boost_1"),
-            discord.SelectOption(label="🚀 Boost: 2 Boost = 64GB", value="boost_2"),
-        ]
+        options = [discord.SelectOption(label=label, value=value)
+                   for value, (label, _, _) in available_reward_plans().items()]
         super().__init__(placeholder="Select your reward plan", options=options)
 
     async def callback(self, interaction: discord.Interaction):
         value = self.values[0]
-        ram = 16000
-        cpu = 40
+        _, ram, cpu = REWARD_PLANS[value]
         user = interaction.user
         member = interaction.guild.get_member(user.id)
 
@@ -1395,17 +3856,19 @@ class RewardSelect(discord.ui.Select):
             await interaction.response.send_message("❌ You need at least 3 invites to claim this reward.", ephemeral=True)
             return
         elif value == "invite_8" and not await has_required_invites(user, 8):
-            ram = 32000
             await interaction.response.send_message("❌ You need at least 8 invites to claim this reward.", ephemeral=True)
             return
         elif value == "boost_1" and not has_required_boost(member, 1):
             await interaction.response.send_message("❌ You must boost the server to claim this reward.", ephemeral=True)
             return
         elif value == "boost_2" and not has_required_boost(member, 2):
-            ram = 32000
             await interaction.response.send_message("❌ You must boost the server with 2 boosts.", ephemeral=True)
             return
 
+        if not quota.has_room(str(user.id)):
+            await interaction.response.send_message(embed=quota_exceeded_embed(str(user.id)), ephemeral=True)
+            return
+
         username = user.name.replace(" ", "_")
         container_name = f"VPS_{username}_{generate_random_string(6)}"
         expiry = format_expiry_date(parse_time_to_seconds("7d"))
@@ -1427,6 +3890,9 @@ class RewardView(discord.ui.View):
 
 @bot.tree.command(name="create", description="🎁 Claim a VPS reward by invite or boost")
 async def create(interaction: discord.Interaction):
+    if not available_reward_plans():
+        await interaction.response.send_message("❌ No reward plan fits on this node.", ephemeral=True)
+        return
     embed = discord.Embed(
         title="🎁 VPS Reward Claim",
         description="Select your reward type. Invite-based or Boost-based.",
@@ -1437,51 +3903,82 @@ async def create(interaction: discord.Interaction):
 # Placeholder for existing !create-vps and !vpslist to confirm dual-prefix support
 @bot.command(name="create-vps")
 async def create_vps(ctx, setram: str, setcpu: str, setdisk: str, usertagping: discord.Member):
-    if ctx.author.id not in ADMIN_IDS:
+    if not is_admin(ctx.author.id):
         await ctx.send("❌ You don't have permission to use this command.", delete_after=5)
         return
 
     user_id = str(usertagping.id)
     container_name = f"vps_{user_id}_{int(time.time())}"
-    os_choice = "ubuntu-22.04"
+    try:
+        img = catalog.require("ubuntu")
+    except ImageNotReady as e:
+        await ctx.send(embed=image_not_ready_embed(e))
+        return
+    os_choice = img.label
+
+    need = (plan_memory_bytes(setram), plan_cpus(setcpu))
+    if not need[0] or not need[1]:
+        await ctx.send("❌ RAM and CPU must look like `2g` and `1`.")
+        return
 
-    await ctx.send(f"First, your VPS is installing {os_choice}, wait a second.")
+    if not quota.reserve(user_id):
+        await ctx.send(embed=quota_exceeded_embed(user_id))
+        return
 
+    token = None
     try:
-        subprocess.run(
-            [
-                "docker", "run", "-d", "--name", container_name,
-                "--memory", setram, "--cpus", setcpu,
-                os_choice
-            ],
-            check=True, capture_output=True, text=True
-        )
+        token = await admit_deploy(ctx.send, *need)
+        if token is None:
+            return
+        await ctx.send(f"First, your VPS is installing {os_choice}, wait a second.")
 
-        password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
-        subprocess.run(
-            ["docker", "exec", container_name, "bash", "-c", 
-             f"useradd -m -s /bin/bash user && echo 'user:{password}' | chpasswd"],
-            check=True, capture_output=True, text=True
-        )
+        volume = None
+        try:
+            rec = VpsRecord(
+                user_id, container_name, os_type=os_choice, ram=setram, cpu=setcpu,
+                creator=str(ctx.author.id), created=time.time(), disk=setdisk
+            )
+            volume = await create_vps_volumes()
+            registry.set_volume(container_name, volume, volume_size_bytes(setdisk))
+            await docker_api.run(container_name, img.ref, vps_host_config(setram, setcpu, volume=volume),
+                                 Labels=rec.labels())
+
+            password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
+            exit_code, output = await docker_api.exec_run(
+                container_name,
+                ["bash", "-c", f"useradd -m -s /bin/bash user && echo 'user:{password}' | chpasswd"]
+            )
+            if exit_code != 0:
+                raise DockerAPIError(exit_code, output)
 
-        with open("database.txt", "a") as f:
-            f.write(f"{user_id}|{container_name}|{time.time()}|{os_choice}|{setram}|{setcpu}|{setdisk}\n")
+            await add_record(rec)
 
-        ssh_command = f"ssh user@{PUBLIC_IP} -p {random.randint(10000, 65535)}"
-        embed = discord.Embed(
-            title="🖥️ VPS Created Successfully",
-            description=f"**VPS Name:** {container_name}\n**OS:** {os_choice}\n**RAM:** {setram}\n**CPU:** {setcpu}\n**Disk:** {setdisk}\n**SSH Command:**\n```{ssh_command}```\n**Password:** {password}",
-            color=0x00ff00
-        )
-        try:
-            await usertagping.send(embed=embed)
-            await ctx.send(f"✅ Your VPS successfully installed, <@{user_id}>! Check your DMs.")
-        except discord.Forbidden:
-            await ctx.send(embed=embed)
+            ssh_command = f"ssh user@{PUBLIC_IP} -p {random.randint(10000, 65535)}"
+            embed = discord.Embed(
+                title="🖥️ VPS Created Successfully",
+                description=f"**VPS Name:** {container_name}\n**OS:** {os_choice}\n**RAM:** {setram}\n**CPU:** {setcpu}\n**Disk:** {setdisk}\n**SSH Command:**\n```{ssh_command}```\n**Password:** {password}",
+                color=0x00ff00
+            )
+            try:
+                await usertagping.send(embed=embed)
+                await ctx.send(f"✅ Your VPS successfully installed, <@{user_id}>! Check your DMs.")
+            except discord.Forbidden:
+                await ctx.send(embed=embed)
 
-    except subprocess.CalledProcessError as e:
-        await ctx.send(f"❌ Failed to create VPS: {e.stderr}")
-        return
+        except (ValueError,) + DOCKER_ERRORS as e:
+            # roll back whatever was made before the failure
+            if volume:
+                try:
+                    await docker_api.remove(container_name, force=True)
+                except DOCKER_ERRORS:
+                    pass
+                await remove_vps_volumes(volume)
+                registry.remove_volume(container_name)
+            await ctx.send(f"❌ Failed to create VPS: {e}")
+            return
+    finally:
+        capacity.release(token)
+        quota.release(user_id)
 
 @bot.command(name="vpslist")
 async def vpslist(ctx):
@@ -1499,29 +3996,15 @@ async def vpslist(ctx):
         await ctx.send(embed=embed)
         return
 
-    for server in servers:
-        parts = server.split('|')
-        container_name = parts[1]
-        ram = parts[4] if len(parts) > 4 else "Unknown"
-        cpu = parts[5] if len(parts) > 5 else "Unknown"
-        disk = parts[6] if len(parts) > 6 else "Shared / 10TB"
+    for rec in servers:
+        container_name = rec.name
+        ram = rec.ram or "Unknown"
+        cpu = rec.cpu or "Unknown"
+        disk = rec.disk or "Shared / 10TB"
 
-        try:
-            result = subprocess.run(
-                ["docker", "inspect", "-f", "{{.State.Running}}", container_name],
-                capture_output=True, text=True, check=True
-            )
-            running = result.stdout.strip()
-            status = "🟢 Online" if running == "true" else "🔴 Offline"
-        except subprocess.CalledProcessError:
-            status = "🔴 Unknown"
+        status = state_cache.badge(container_name)
 
-        try:
-            start_time = float(parts[2])
-            running_time = time.time() - start_time
-            running_time_str = f"{int(running_time // 3600)}h {int((running_time % 3600) // 60)}m"
-        except (IndexError, ValueError):
-            running_time_str = "Unknown"
+        running_time_str = rec.running_time_str()
 
         embed.add_field(
             name=f"{container_name} ({status})",
@@ -1534,41 +4017,102 @@ async def vpslist(ctx):
 @bot.tree.command(name="suspendvps", description="❌ Admin: Suspend all VPS of a user")
 @app_commands.describe(usertag="The user whose VPS you want to suspend")
 async def suspendvps(interaction: discord.Interaction, usertag: discord.User):
-    if interaction.user.id not in ADMIN_IDS:
+    if not is_admin(interaction.user.id):
         await interaction.response.send_message("❌ Only admins can use this command.", ephemeral=True)
         return
 
     user_id = str(usertag.id)
-    containers = [line.split('|')[0] for line in get_user_servers(user_id)]
+    containers = await owned_container_names(user_id)
 
     if not containers:
         await interaction.response.send_message("⚠️ No VPS found for that user.", ephemeral=True)
         return
 
-    for container in containers:
-        os.system(f"docker pause {container}")
-
-    await interaction.response.send_message(f"⛔ Suspended VPS: `{', '.join(containers)}`", ephemeral=True)
+    await interaction.response.defer(ephemeral=True)
+    op = BulkOperation(f"⛔ Suspending VPS of {usertag}", "pause", containers)
+    message = await interaction.followup.send(embed=op.embed(), ephemeral=True, wait=True)
+    await op.run(message)
 
 
 @bot.tree.command(name="unsuspendvps", description="✅ Admin: Unsuspend all VPS of a user")
 @app_commands.describe(usertag="The user whose VPS you want to unsuspend")
 async def unsuspendvps(interaction: discord.Interaction, usertag: discord.User):
-    if interaction.user.id not in ADMIN_IDS:
+    if not is_admin(interaction.user.id):
         await interaction.response.send_message("❌ Only admins can use this command.", ephemeral=True)
         return
 
     user_id = str(usertag.id)
-    containers = [line.split('|')[0] for line in get_user_servers(user_id)]
+    containers = await owned_container_names(user_id)
 
     if not containers:
         await interaction.response.send_message("⚠️ No VPS found for that user.", ephemeral=True)
         return
 
-    for container in containers:
-        os.system(f"docker unpause {container}")
+    await interaction.response.defer(ephemeral=True)
+    op = BulkOperation(f"✅ Unsuspending VPS of {usertag}", "unpause", containers)
+    message = await interaction.followup.send(embed=op.embed(), ephemeral=True, wait=True)
+    await op.run(message)
+
+@bot.tree.command(name="rebuild-registry", description="🧩 Admin: Restore missing VPS records from container labels")
+async def rebuild_registry(interaction: discord.Interaction):
+    if not is_admin(interaction.user.id):
+        await interaction.response.send_message("❌ Only admins can use this command.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    try:
+        restored = await rebuild_registry_from_labels()
+    except DOCKER_ERRORS as e:
+        await interaction.followup.send(f"❌ Could not list containers: {e}", ephemeral=True)
+        return
+    await interaction.followup.send(f"✅ Restored {restored} VPS record(s) from labels. Total now: {registry.count()}", ephemeral=True)
+
+@bot.tree.command(name="resize", description="📐 Admin: Change a VPS's RAM/CPU live, without a restart")
+@app_commands.describe(
+    container_name="VPS container name",
+    ram="New RAM allocation in GB",
+    cpu="New CPU cores",
+    swap="Swap in GB on top of RAM (default: same as RAM)",
+    pids="Maximum number of processes"
+)
+async def resize(interaction: discord.Interaction, container_name: str, ram: int = None, cpu: int = None,
+                 swap: int = None, pids: int = None):
+    if not is_admin(interaction.user.id):
+        await interaction.response.send_message("❌ Only admins can use this command.", ephemeral=True)
+        return
+
+    rec = registry.get(container_name)
+    if rec is None:
+        await interaction.response.send_message("❌ No VPS found with that name.", ephemeral=True)
+        return
+    if ram is None and cpu is None and pids is None:
+        await interaction.response.send_message("⚠️ Give at least one of ram, cpu or pids.", ephemeral=True)
+        return
+    if swap is not None and ram is None:
+        await interaction.response.send_message("⚠️ Swap can only be changed together with ram.", ephemeral=True)
+        return
+
+    grow_mem = max(ram * 1024 ** 3 - plan_memory_bytes(rec.ram), 0) if ram is not None else 0
+    grow_cpu = max(cpu - plan_cpus(rec.cpu), 0) if cpu is not None else 0
+    if not capacity.fits(grow_mem, grow_cpu):
+        await interaction.response.send_message(embed=capacity_embed(grow_mem, grow_cpu), ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    old_plan = f"{rec.ram or '?'}GB / {rec.cpu or '?'} CPU"
+    try:
+        rec = await resize_vps(rec, ram=ram, cpu=cpu, swap=swap, pids=pids)
+    except DOCKER_ERRORS as e:
+        await interaction.followup.send(f"❌ Resize failed: {e}", ephemeral=True)
+        return
 
-    await interaction.response.send_message(f"✅ Unsuspended VPS: `{', '.join(containers)}`", ephemeral=True)
+    embed = discord.Embed(
+        title="📐 VPS Resized",
+        description=f"**{container_name}**\n{old_plan} → {rec.ram or '?'}GB / {rec.cpu or '?'} CPU"
+                    + (f"\nProcess limit: {pids}" if pids is not None else ""),
+        color=0x00ff00
+    )
+    await interaction.followup.send(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="sendvps", description="👑 Admin: Send VPS details to a user via DM")
 @app_commands.describe(
@@ -1591,7 +4135,7 @@ async def sendvps(
     user: discord.User
 ):
     # Check admin permissions
-    if interaction.user.id not in ADMIN_IDS:
+    if not is_admin(interaction.user.id):
         embed = discord.Embed(
             title="❌ Access Denied",
             description="Only lonely.king admins can use this command.",
@@ -1633,7 +4177,7 @@ async def sendvps(
 @bot.tree.command(name="ipv4", description="🌐 Admin: Setup port forward in VPS and DM SSH info")
 @app_commands.describe(container_name="VPS container name", usertag="User to send SSH info")
 async def sharedipv4(interaction: discord.Interaction, container_name: str, usertag: discord.User):
-    if interaction.user.id not in ADMIN_IDS:
+    if not is_admin(interaction.user.id):
         await interaction.response.send_message("❌ Only admins can use this command.", ephemeral=True)
         return
 
@@ -1641,10 +4185,11 @@ async def sharedipv4(interaction: discord.Interaction, container_name: str, user
 
     # Step 1: Run the port forwarding setup and capture the output
     try:
-        result = os.popen(
-            f'docker exec {container_name} bash -c "apt update -y && apt install curl -y && bash <(curl -fsSL https://raw.githubusercontent.com/steeldevlol/port/refs/heads/main/install)"'
-        ).read()
-    except Exception as e:
+        _, result = await docker_api.exec_run(
+            container_name,
+            ["bash", "-c", "apt update -y && apt install curl -y && bash <(curl -fsSL https://raw.githubusercontent.com/steeldevlol/port/refs/heads/main/install)"]
+        )
+    except DOCKER_ERRORS as e:
         await interaction.followup.send(content=f"❌ Error while setting up vps forwarding:\n{e}", ephemeral=True)
         return
 
@@ -1676,9 +4221,10 @@ async def sharedipv4(interaction: discord.Interaction, container_name: str, user
         await interaction.followup.send("❌ Could not DM the user.", ephemeral=True)
 
 @bot.tree.command(name="reinstall", description="🔁 Reinstall a user's VPS with selected OS")
-@app_commands.describe(usertag="User to reinstall VPS for", os="OS template (ubuntu-22.04 / debian-12)")
-async def reinstall(interaction: discord.Interaction, usertag: discord.Member, os: str):
-    if str(interaction.user.id) not in ADMIN:  # use your admin list or role check
+@app_commands.describe(usertag="User to reinstall VPS for", os_name="OS (ubuntu / debian) or an os_templates/<name>.Dockerfile template")
+@app_commands.rename(os_name="os")
+async def reinstall(interaction: discord.Interaction, usertag: discord.Member, os_name: str):
+    if not is_admin(interaction.user.id):
         return await interaction.response.send_message("❌ You are not authorized.", ephemeral=True)
 
     userid = str(usertag.id)
@@ -1686,29 +4232,61 @@ async def reinstall(interaction: discord.Interaction, usertag: discord.Member, o
     if not vps_list:
         return await interaction.response.send_message("❌ No VPS found for this user.", ephemeral=True)
 
-    container_name = vps_list[0].split('|')[0] if '|' in vps_list[0] else vps_list[0]
+    rec = VpsRecord.parse(vps_list[0].to_line())
+    container_name = rec.name
 
-    # Check if Dockerfile exists
-    dockerfile_path = f"os_templates/{os}.Dockerfile"
-    if not os.path.exists(dockerfile_path):
+    # A template file wins over the catalog OS of the same name
+    use_template = templates.path(os_name) is not None
+    if not use_template and catalog.get(os_name) is None:
         return await interaction.response.send_message("❌ OS template not found.", ephemeral=True)
 
-    await interaction.response.send_message(f"🛠️ Reinstalling `{container_name}` with `{os}`...", ephemeral=True)
+    await interaction.response.send_message(f"🛠️ Reinstalling `{container_name}` with `{os_name}`...", ephemeral=True)
 
     try:
-        os.system(f"docker stop {container_name}")
-        os.system(f"docker rm {container_name}")
-        os.system(f"docker build -t {container_name}-img -f {dockerfile_path} .")
-        os.system(f"docker run -d --name {container_name} {container_name}-img")
-    except Exception as e:
+        if use_template:
+            image, os_label = await templates.image(os_name), os_name
+        else:
+            img = catalog.require(os_name)
+            image, os_label = img.ref, img.label
+
+        # keep the VPS's limits across the rebuild
+        try:
+            host = (await docker_api.inspect(container_name))["HostConfig"]
+            host_config = {k: host[k] for k in ("Memory", "MemorySwap", "NanoCpus", "PidsLimit", "Privileged", "CapAdd")
+                           if host.get(k)}
+        except DockerAPIError as e:
+            if e.status != 404:
+                raise
+            host_config = {"Privileged": True, "CapAdd": ["ALL"], **record_limits(rec)}
+
+        # /root and /home live on the VPS's volumes and are reattached, not copied
+        row = registry.get_volume(container_name)
+        if row is None:
+            volume = await create_vps_volumes()
+            registry.set_volume(container_name, volume, volume_size_bytes(rec.disk))
+        else:
+            volume = row[0]
+        host_config["Mounts"] = vps_mounts(volume)
+
+        rec.os_type = os_label
+        await docker_api.destroy(container_name)
+        await docker_api.run(container_name, image, host_config, Tty=True, OpenStdin=True, Labels=rec.labels())
+        ssh_session_line = await tmate_session(container_name)
+    except ImageNotReady as e:
+        return await interaction.followup.send(embed=image_not_ready_embed(e), ephemeral=True)
+    except (OSError,) + DOCKER_ERRORS as e:
         return await interaction.followup.send(f"❌ Reinstall failed: {e}", ephemeral=True)
 
+    rec.ssh = ssh_session_line or rec.ssh
+    await add_record(rec)
+
     try:
-        await usertag.send(f"✅ Your VPS `{container_name}` has been reinstalled with `{os}`.")
+        ssh_note = f"\n🔑 New SSH: ```{ssh_session_line}```" if ssh_session_line else ""
+        await usertag.send(f"✅ Your VPS `{container_name}` has been reinstalled with `{os_label}`.{ssh_note}")
     except:
         pass
 
-    await interaction.followup.send(f"✅ Reinstalled VPS `{container_name}` for {usertag.mention} with `{os}`.", ephemeral=True)
+    await interaction.followup.send(f"✅ Reinstalled VPS `{container_name}` for {usertag.mention} with `{os_label}`.", ephemeral=True)
 
 @bot.tree.command(name="nodes", description="📊 Show your VPS instances with status and resources")
 async def nodes(interaction: discord.Interaction):
@@ -1726,106 +4304,86 @@ async def nodes(interaction: discord.Interaction):
         await interaction.followup.send(embed=embed, ephemeral=False)
         return
 
-    def make_embed(servers):
+    async def make_embed(servers):
         embed = discord.Embed(
             title="🖥️ VPS Instance List",
             description=f"Showing {len(servers)} instance(s) for <@{user_id}>",
             color=0x00aaff
         )
-        for server in servers:
-            parts = server.split('|')
-            container_name = shlex.quote(parts[1])  # Correct index
-            stats = get_container_stats(container_name)
-            try:
-                result = subprocess.run(
-                    ["docker", "inspect", "-f", "{{.State.Running}}", container_name],
-                    capture_output=True, text=True, check=True
-                )
-                running = result.stdout.strip()
-                status_str = "🟢 Online" if running == "true" else "🔴 Offline"
-            except subprocess.CalledProcessError:
-                status_str = "🔴 Unknown"
-
-            ram_info = "5gb/64gb"
-            cpu_info = "0.00%"
+        snap = await stats_collector.snapshot()
+        for rec in servers:
+            container_name = shlex.quote(rec.name)
+            stats = snap.get(rec.name)
+            status_str = stats["status"]
+
+            ram_info = stats["memory"]
+            cpu_info = stats["cpu"]
             disk_info = "Shared / 10TB"
 
-            # Calculate running time (assuming parts[2] is creation timestamp)
-            try:
-                start_time = float(parts[2])  # Assuming timestamp in database.txt
-                running_time = time.time() - start_time
-                running_time_str = f"{int(running_time // 3600)}h {int((running_time % 3600) // 60)}m"
-            except (IndexError, ValueError):
-                running_time_str = "Unknown"
+            running_time_str = rec.running_time_str()
 
             embed.add_field(
                 name=f"{container_name} ({status_str})",
-                value=f"**RAM:** 64gb\n**CPU:** 10\n**Disk:** 190gb\n**Running Time:** {running_time_str}",
+                value=f"**RAM:** 64gb\n**CPU:** 10\n**Disk:** 190gb\n**Usage:** {ram_info} RAM, {cpu_info} CPU\n**Running Time:** {running_time_str}",
                 inline=False
             )
         return embed
 
     class VPSSelect(Select):
         def __init__(self):
-            container_names = [shlex.quote(line.split('|')[1]) for line in servers if '|' in line]
+            container_names = [shlex.quote(rec.name) for rec in servers]
             options = [discord.SelectOption(label=name, value=name) for name in container_names]
             super().__init__(placeholder="Select a VPS to check status", options=options)
 
         async def callback(self, interaction2):
             container_name = self.values[0]
-            stats = get_container_stats(container_name)
-            try:
-                result = subprocess.run(
-                    ["docker", "inspect", "-f", "{{.State.Running}}", container_name],
-                    capture_output=True, text=True, check=True
-                )
-                running = result.stdout.strip()
-                status = "🟢 Online" if running == "true" else "🔴 Offline"
-                color = 0x2ecc71 if running == "true" else 0xe74c3c
-            except subprocess.CalledProcessError:
-                status = "🔴 Unknown"
-                color = 0xe74c3c
-
-            ram_info = "5gb/64gb"
-            cpu_info = "0.00%"
+            await interaction2.response.defer()
+            stats = (await stats_collector.snapshot()).get(container_name)
+            status = stats["status"]
+            color = 0x2ecc71 if state_cache.is_running(container_name) else 0xe74c3c
+
+            ram_info = stats["memory"]
+            cpu_info = stats["cpu"]
             disk_info = "Shared / 10TB"
 
             # Calculate running time
-            for server in servers:
-                if server.split('|')[1] == container_name:
-                    try:
-                        start_time = float(server.split('|')[2])
-                        running_time = time.time() - start_time
-                        running_time_str = f"{int(running_time // 3600)}h {int((running_time % 3600) // 60)}m"
-                    except (IndexError, ValueError):
-                        running_time_str = "Unknown"
+            for rec in servers:
+                if rec.name == container_name:
+                    running_time_str = rec.running_time_str()
                     break
             else:
                 running_time_str = "Unknown"
 
             embed = discord.Embed(
                 title=f"🖥️ VPS Status: `{container_name}`",
-                description=f"**Status:** {status}\n**RAM:** 64gb | **CPU:** 10 | **Disk:** 190gb\n**Running Time:** {running_time_str}",
+                description=f"**Status:** {status}\n**RAM:** 64gb | **CPU:** 10 | **Disk:** 190gb\n**Usage:** {ram_info} RAM, {cpu_info} CPU\n**Running Time:** {running_time_str}",
                 color=color
             )
             embed.set_footer(text="VPS Dashboard")
 
-            await interaction2.response.edit_message(embed=embed, view=ManageButtons(container_name))
+            await interaction2.edit_original_response(embed=embed, view=ManageButtons(container_name))
 
     class ManageButtons(View):
         def __init__(self, container_name):
             super().__init__(timeout=None)
             self.container_name = container_name
 
+        async def interaction_check(self, interaction2):
+            if not has_access(interaction2.user.id, self.container_name):
+                await interaction2.response.send_message("❌ You do not have access to this VPS.", ephemeral=True)
+                return False
+            return True
+
         @discord.ui.button(label="🔄 Refresh", style=discord.ButtonStyle.primary)
         async def refresh(self, interaction2, button):
             nonlocal servers
             servers = get_user_servers(user_id)
-            await interaction2.response.edit_message(embed=make_embed(servers), view=self)
+            await interaction2.response.defer()
+            await interaction2.edit_original_response(embed=await make_embed(servers), view=self)
 
         @discord.ui.button(label="📊 Check Status", style=discord.ButtonStyle.secondary)
         async def check_status(self, interaction2, button):
-            container_names = [shlex.quote(line.split('|')[1]) for line in servers if '|' in line]
+            container_names = [shlex.quote(rec.name) for rec in servers]
             if len(container_names) > 1:
                 embed = discord.Embed(
                     title="🖥️ Select a VPS to Check Status",
@@ -1836,66 +4394,56 @@ async def nodes(interaction: discord.Interaction):
                 view.add_item(VPSSelect())
                 await interaction2.response.edit_message(embed=embed, view=view)
             else:
-                stats = get_container_stats(self.container_name)
-                try:
-                    result = subprocess.run(
-                        ["docker", "inspect", "-f", "{{.State.Running}}", self.container_name],
-                        capture_output=True, text=True, check=True
-                    )
-                    running = result.stdout.strip()
-                    status = "🟢 Online" if running == "true" else "🔴 Offline"
-                    color = 0x2ecc71 if running == "true" else 0xe74c3c
-                except subprocess.CalledProcessError:
-                    status = "🔴 Unknown"
-                    color = 0xe74c3c
-
-                ram_info = "5gb/64gb"
-                cpu_info = "0.00%"
+                await interaction2.response.defer()
+                stats = (await stats_collector.snapshot()).get(self.container_name)
+                status = stats["status"]
+                color = 0x2ecc71 if state_cache.is_running(self.container_name) else 0xe74c3c
+
+                ram_info = stats["memory"]
+                cpu_info = stats["cpu"]
                 disk_info = "Shared / 10TB"
 
-                for server in servers:
-                    if server.split('|')[1] == self.container_name:
-                        try:
-                            start_time = float(server.split('|')[2])
-                            running_time = time.time() - start_time
-                            running_time_str = f"{int(running_time // 3600)}h {int((running_time % 3600) // 60)}m"
-                        except (IndexError, ValueError):
-                            running_time_str = "Unknown"
+                for rec in servers:
+                    if rec.name == self.container_name:
+                        running_time_str = rec.running_time_str()
                         break
                 else:
                     running_time_str = "Unknown"
 
                 embed = discord.Embed(
                     title=f"🖥️ VPS Status: `{self.container_name}`",
-                    description=f"**Status:** {status}\n**RAM:** 64gb | **CPU:** 10 | **Disk:** 190gb\n**Running Time:** {running_time_str}",
+                    description=f"**Status:** {status}\n**RAM:** 64gb | **CPU:** 10 | **Disk:** 190gb\n**Usage:** {ram_info} RAM, {cpu_info} CPU\n**Running Time:** {running_time_str}",
                     color=color
                 )
                 embed.set_footer(text="VPS Dashboard")
-                await interaction2.response.edit_message(embed=embed, view=self)
+                await interaction2.edit_original_response(embed=embed, view=self)
 
         @discord.ui.button(label="✅ Start", style=discord.ButtonStyle.success)
         async def start(self, i, b):
+            await i.response.defer(ephemeral=True)
             try:
-                subprocess.run(["docker", "start", self.container_name], check=True, capture_output=True, text=True)
-                await i.response.send_message("✅ VPS started.", ephemeral=True)
-            except subprocess.CalledProcessError as e:
-                await i.response.send_message(f"❌ Error: {e.stderr}", ephemeral=True)
+                await docker_api.start(self.container_name)
+                await i.followup.send("✅ VPS started.", ephemeral=True)
+            except DOCKER_ERRORS as e:
+                await i.followup.send(f"❌ Error: {e}", ephemeral=True)
 
         @discord.ui.button(label="🛑 Stop", style=discord.ButtonStyle.danger)
         async def stop(self, i, b):
+            await i.response.defer(ephemeral=True)
             try:
-                subprocess.run(["docker", "stop", self.container_name], check=True, capture_output=True, text=True)
-                await i.response.send_message("🛑 VPS stopped.", ephemeral=True)
-            except subprocess.CalledProcessError as e:
-                await i.response.send_message(f"❌ Error: {e.stderr}", ephemeral=True)
+                await docker_api.stop(self.container_name)
+                await i.followup.send("🛑 VPS stopped.", ephemeral=True)
+            except DOCKER_ERRORS as e:
+                await i.followup.send(f"❌ Error: {e}", ephemeral=True)
 
         @discord.ui.button(label="🔁 Restart", style=discord.ButtonStyle.primary)
         async def restart(self, i, b):
+            await i.response.defer(ephemeral=True)
             try:
-                subprocess.run(["docker", "restart", self.container_name], check=True, capture_output=True, text=True)
-                await i.response.send_message("🔁 VPS restarted.", ephemeral=True)
-            except subprocess.CalledProcessError as e:
-                await i.response.send_message(f"❌ Error: {e.stderr}", ephemeral=True)
+                await docker_api.restart(self.container_name)
+                await i.followup.send("🔁 VPS restarted.", ephemeral=True)
+            except DOCKER_ERRORS as e:
+                await i.followup.send(f"❌ Error: {e}", ephemeral=True)
 
         @discord.ui.button(label="🔑 SSH Info", style=discord.ButtonStyle.secondary)
         async def ssh_info(self, i, b):
@@ -1916,10 +4464,11 @@ async def nodes(interaction: discord.Interaction):
 
         @discord.ui.button(label="⬅️ Back", style=discord.ButtonStyle.secondary)
         async def back(self, i, b):
-            await i.response.edit_message(embed=make_embed(servers), view=ManageButtons(self.container_name))
+            await i.response.defer()
+            await i.edit_original_response(embed=await make_embed(servers), view=ManageButtons(self.container_name))
 
-    container_names = [shlex.quote(line.split('|')[1]) for line in servers if '|' in line]
-    await interaction.followup.send(embed=make_embed(servers), view=ManageButtons(container_names[0]), ephemeral=False)
+    container_names = [shlex.quote(rec.name) for rec in servers]
+    await interaction.followup.send(embed=await make_embed(servers), view=ManageButtons(container_names[0]), ephemeral=False)
 
 # ====== FILES / CONSTANTS ======
 ADMIN_FILE       = "admin_list.txt"  # each line: user_id
@@ -1928,40 +4477,91 @@ SHARED_IPV4_FILE = "shared_ipv4.txt" # first line is shared IP (fallback used if
 DEFAULT_SHARED_IP = "45.184.85.20"
 
 # ====== HELPERS ======
+class AdminAuthority:
+    """Bot admins: ADMIN_IDS merged with admin_list.txt, held as a frozenset.
+
+    The file is re-read only when its mtime changes, and its mtime is looked
+    at no more than once per check_interval, so permission checks are a set
+    lookup. add/remove update the set in place and persist to the file.
+    """
+
+    def __init__(self, path, static_ids, check_interval=5.0):
+        self.path = path
+        self.static_ids = frozenset(str(i) for i in static_ids)
+        self.check_interval = check_interval
+        self._file_ids = frozenset()
+        self._ids = self.static_ids
+        self._mtime = None
+        self._checked = None
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        mtime = self._file_mtime()
+        if mtime == self._mtime:
+            return
+        ids = frozenset()
+        if mtime is not None:
+            with open(self.path, "r") as f:
+                ids = frozenset(line.strip() for line in f if line.strip())
+        self._set(ids, mtime)
+
+    def _set(self, file_ids, mtime):
+        self._file_ids = file_ids
+        self._ids = self.static_ids | file_ids
+        self._mtime = mtime
+
+    def ids(self):
+        self._refresh()
+        return self._ids
+
+    def is_admin(self, user_id):
+        return str(user_id) in self.ids()
+
+    def add(self, user_id):
+        uid = str(user_id)
+        self._refresh()
+        if uid in self._file_ids:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(f"{uid}\n")
+        self._set(self._file_ids | {uid}, self._file_mtime())
+
+    def remove(self, user_id):
+        uid = str(user_id)
+        self._refresh()
+        if uid not in self._file_ids:
+            return
+        ids = self._file_ids - {uid}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write("".join(f"{x}\n" for x in sorted(ids)))
+        os.replace(tmp, self.path)
+        self._set(ids, self._file_mtime())
+
+admins = AdminAuthority(ADMIN_FILE, ADMIN_IDS)
+
 def is_admin(user_id: int) -> bool:
-    if not os.path.exists(ADMIN_FILE):
-        return False
-    with open(ADMIN_FILE, "r") as f:
-        ids = {line.strip() for line in f if line.strip()}
-    return str(user_id) in ids
+    return admins.is_admin(user_id)
 
 def add_admin(user_id: str):
-    os.makedirs(os.path.dirname(ADMIN_FILE) or ".", exist_ok=True)
-    with open(ADMIN_FILE, "a") as f:
-        f.write(f"{user_id}\n")
+    admins.add(user_id)
 
 def remove_admin(user_id: str):
-    if not os.path.exists(ADMIN_FILE): return
-    with open(ADMIN_FILE, "r") as f:
-        lines = [ln.strip() for ln in f if ln.strip()]
-    lines = [x for x in lines if x != str(user_id)]
-    with open(ADMIN_FILE, "w") as f:
-        f.write("\n".join(lines) + ("\n" if lines else ""))
+    admins.remove(user_id)
 
 def list_user_vps(user_id: int):
-    """Return list of container names owned by user from database.txt"""
-    vps = []
-    if not os.path.exists(DATABASE_FILE):
-        return vps
-    with open(DATABASE_FILE, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line or "|" not in line:
-                continue
-            cname, uid = line.split("|", 1)
-            if uid == str(user_id):
-                vps.append(cname)
-    return vps
+    """Return list of container names owned by user from the registry"""
+    return [rec.name for rec in get_user_servers(str(user_id))]
 
 def get_shared_ipv4():
     if os.path.exists(SHARED_IPV4_FILE):
@@ -1974,35 +4574,47 @@ def get_shared_ipv4():
             pass
     return DEFAULT_SHARED_IP
 
+class CredentialStore:
+    """container_name -> SSH password, cached in a dict over the ssh_creds table.
+
+    Writes go to SQLite first (a batch is one transaction, so a rotation is
+    applied entirely or not at all) and only then to the dict.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._passwords = None
+
+    def _load(self):
+        if self._passwords is None:
+            self._passwords = dict(self.registry.all_passwords())
+        return self._passwords
+
+    def get(self, container_name):
+        return self._load().get(container_name)
+
+    def upsert(self, container_name, password):
+        self._load()
+        self.registry.set_password(container_name, password)
+        self._passwords[container_name] = password
+
+    def upsert_many(self, pairs):
+        pairs = list(pairs)
+        self._load()
+        self.registry.set_passwords(pairs)
+        self._passwords.update(pairs)
+
+creds = CredentialStore(registry)
+
 def save_ssh_pass(container_name: str, password: str):
-    rows = []
-    if os.path.exists(SSH_CREDS_FILE):
-        with open(SSH_CREDS_FILE, "r") as f:
-            rows = [ln.strip() for ln in f if ln.strip()]
-    found = False
-    for i, row in enumerate(rows):
-        if "|" in row:
-            cname, _ = row.split("|", 1)
-            if cname == container_name:
-                rows[i] = f"{container_name}|{password}"
-                found = True
-                break
-    if not found:
-        rows.append(f"{container_name}|{password}")
-    with open(SSH_CREDS_FILE, "w") as f:
-        f.write("\n".join(rows) + ("\n" if rows else ""))
+    creds.upsert(container_name, password)
+
+def save_ssh_passes(pairs):
+    """Batched save_ssh_pass for rotating many containers at once."""
+    creds.upsert_many(pairs)
 
 def get_ssh_pass(container_name: str) -> str:
-    if not os.path.exists(SSH_CREDS_FILE):
-        return "unknown"
-    with open(SSH_CREDS_FILE, "r") as f:
-        for line in f:
-            line = line.strip()
-            if "|" in line:
-                cname, pwd = line.split("|", 1)
-                if cname == container_name:
-                    return pwd or "unknown"
-    return "unknown"
+    return creds.get(container_name) or "unknown"
 
 def fmt_gb(bytes_val: int) -> str:
     return f"{bytes_val / (1024**3):.2f} GB"
@@ -2049,27 +4661,72 @@ def get_total_disk_gb():
         return "unknown"
 
 def docker_ok():
-    return docker_client is not None and docker is not None
-
-def container_stats(container_name: str):
-    """Return (status_text, color, ram_gb, cpu_cores, disk_txt, ip)"""
+    """True when the SDK client exists and the circuit breaker is not open."""
+    return docker_client is not None and docker_breaker.healthy()
+
+def docker_health():
+    """User-facing one-liner for the state docker_ok() summarises."""
+    if docker_client is None:
+        return "🔴 Offline (Docker)"
+    if not docker_breaker.healthy():
+        return f"🟡 Degraded (Docker not responding, retry in {docker_breaker.retry_in():.0f}s)"
+    if docker_breaker.failures:
+        return "🟡 Slow (recent Docker timeouts)"
+    return "🟢 Online"
+
+def _container_stats(container_name: str):
+    c = docker_client.containers.get(container_name)
+    if state_cache.live:
+        status = state_cache.badge(container_name)
+        running = state_cache.is_running(container_name)
+    else:
+        # this fallback runs when the event stream is down, so the cache has nothing to say
+        running = c.status == "running"
+        status = "🟢 Online" if running else "🔴 Offline"
+    color = discord.Color.green() if running else discord.Color.red()
+    # HostConfig Memory/NanoCpus may be 0 if unlimited
+    mem = c.attrs["HostConfig"].get("Memory", 0)
+    ram = f"{mem/(1024**3):.2f} GB" if mem else "unlimited"
+    nano = c.attrs["HostConfig"].get("NanoCpus", 0)
+    cpu = f"{nano/1e9:.2f} Cores" if nano else "unlimited"
+    # disk tracking not native; show 'N/A' (customize if you track)
+    disk = "N/A"
+    ip = c.attrs["NetworkSettings"].get("IPAddress") or "0.0.0.0"
+    return (status, color, ram, cpu, disk, ip, False)
+
+async def container_stats(container_name: str):
+    """Return (status_text, color, ram, cpu, disk_txt, ip, measured)
+
+    ram / cpu are live usage (measured=True) when the container is sampled
+    or its cgroup is readable, otherwise the configured limits.
+    """
+    st = state_cache.get(container_name)
+    usage = stats_sampler.usage(container_name)
+    if usage is None:
+        reading = cgroups.read(st.id) if st else None
+        usage = CgroupStats.usage(reading) if reading else None
+    if usage and docker_ok():
+        cpu = usage["cpu"]
+        status = state_cache.badge(container_name)
+        color = discord.Color.green() if state_cache.is_running(container_name) else discord.Color.red()
+        try:
+            # only the address still needs the API; usage came from cgroups
+            attrs = await docker_pool.run(lambda: docker_client.containers.get(container_name).attrs)
+            ip = attrs["NetworkSettings"].get("IPAddress") or "0.0.0.0"
+        except Exception:
+            ip = "0.0.0.0"
+        return (status, color, usage["memory"], cpu, volume_usage_str(container_name), ip, True)
     if not docker_ok():
-        return ("🔴 Docker Unavailable", discord.Color.red(), "unknown", "unknown", "unknown", "0.0.0.0")
+        return (docker_health(), discord.Color.red(), "unknown", "unknown", "unknown", "0.0.0.0", False)
     try:
-        c = docker_client.containers.get(container_name)
-        status = "🟢 Online" if c.status == "running" else "🔴 Offline"
-        color = discord.Color.green() if c.status == "running" else discord.Color.red()
-        # HostConfig Memory/NanoCpus may be 0 if unlimited
-        mem = c.attrs["HostConfig"].get("Memory", 0)
-        ram = f"{mem/(1024**3):.2f} GB" if mem else "unlimited"
-        nano = c.attrs["HostConfig"].get("NanoCpus", 0)
-        cpu = f"{nano/1e9:.2f} Cores" if nano else "unlimited"
-        # disk tracking not native; show 'N/A' (customize if you track)
-        disk = "N/A"
-        ip = c.attrs["NetworkSettings"].get("IPAddress") or "0.0.0.0"
-        return (status, color, ram, cpu, disk, ip)
+        return await docker_pool.run(_container_stats, container_name)
+    except asyncio.TimeoutError:
+        return ("🟡 Docker not responding", discord.Color.orange(), "unknown", "unknown", "unknown", "0.0.0.0", False)
     except Exception as e:
-        return (f"❌ {e}", discord.Color.red(), "unknown", "unknown", "unknown", "0.0.0.0")
+        return (f"❌ {e}", discord.Color.red(), "unknown", "unknown", "unknown", "0.0.0.0", False)
+
+def resource_line(ram, cpu, measured):
+    return f"**{'Usage' if measured else 'Limits'}:** {ram} RAM, {cpu} CPU"
 
 # ====== /manage VIEW ======
 class ManageVPSView(ui.View):
@@ -2079,24 +4736,25 @@ class ManageVPSView(ui.View):
         self.owner_id = owner_id
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        if interaction.user.id != self.owner_id:
+        if interaction.user.id != self.owner_id or not has_access(interaction.user.id, self.container_name):
             await interaction.response.send_message("❌ You do not own this VPS.", ephemeral=True)
             return False
         return True
 
-    def _container(self):
+    async def _container(self):
         if not docker_ok():
-            raise RuntimeError("Docker not available")
-        return docker_client.containers.get(self.container_name)
+            raise RuntimeError(f"Docker not available: {docker_health()}")
+        return await docker_pool.run(docker_client.containers.get, self.container_name)
 
     async def _send_status_embed(self, interaction: discord.Interaction, edit: bool = True):
-        status, color, ram, cpu, disk, ip = container_stats(self.container_name)
+        status, color, ram, cpu, disk, ip, measured = await container_stats(self.container_name)
         ssh_pass = get_ssh_pass(self.container_name)
         desc = (
             f"**Status:** {status}\n"
             f"**RAM:** 64gb\n"
             f"**CPU:** 10\n"
             f"**Disk:** 190gb\n"
+            f"{resource_line(ram, cpu, measured)}\n"
             f"**IP:** `{ip}`\n"
         )
         embed = discord.Embed(
@@ -2111,50 +4769,57 @@ class ManageVPSView(ui.View):
 
     @ui.button(label="Start", style=discord.ButtonStyle.success)
     async def btn_start(self, interaction: discord.Interaction, _: ui.Button):
+        await interaction.response.defer(ephemeral=True)
         try:
-            self._container().start()
-            await interaction.response.send_message(f"✅ Started `{self.container_name}`", ephemeral=True)
+            c = await self._container()
+            await docker_pool.run(c.start)
+            await interaction.followup.send(f"✅ Started `{self.container_name}`", ephemeral=True)
         except Exception as e:
-            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
 
     @ui.button(label="Stop", style=discord.ButtonStyle.danger)
     async def btn_stop(self, interaction: discord.Interaction, _: ui.Button):
+        await interaction.response.defer(ephemeral=True)
         try:
-            self._container().stop()
-            await interaction.response.send_message(f"🛑 Stopped `{self.container_name}`", ephemeral=True)
+            c = await self._container()
+            await docker_pool.run(c.stop)
+            await interaction.followup.send(f"🛑 Stopped `{self.container_name}`", ephemeral=True)
         except Exception as e:
-            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
 
     @ui.button(label="Restart", style=discord.ButtonStyle.primary)
     async def btn_restart(self, interaction: discord.Interaction, _: ui.Button):
+        await interaction.response.defer(ephemeral=True)
         try:
-            self._container().restart()
-            await interaction.response.send_message(f"🔄 Restarted `{self.container_name}`", ephemeral=True)
+            c = await self._container()
+            await docker_pool.run(c.restart)
+            await interaction.followup.send(f"🔄 Restarted `{self.container_name}`", ephemeral=True)
         except Exception as e:
-            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
 
     @ui.button(label="Regenerate SSH", style=discord.ButtonStyle.secondary)
     async def btn_regen_ssh(self, interaction: discord.Interaction, _: ui.Button):
+        await interaction.response.defer(ephemeral=True)
         try:
-            c = self._container()
+            c = await self._container()
             # simple password generator
             new_pass = f"Root{int(time.time())%1000000:06d}"
             # set root password inside container (requires chpasswd & root)
-            c.exec_run(f"bash -lc \"echo 'root:{new_pass}' | chpasswd\"")
+            await docker_pool.run(c.exec_run, f"bash -lc \"echo 'root:{new_pass}' | chpasswd\"")
             save_ssh_pass(self.container_name, new_pass)
             ip = c.attrs['NetworkSettings'].get('IPAddress') or get_shared_ipv4()
             await interaction.user.send(
                 f"🔑 **New SSH for `{self.container_name}`**\n"
                 f"```ssh root@{ip} -p 22\nPassword: {new_pass}```"
             )
-            await interaction.response.send_message("✅ New SSH sent in DM.", ephemeral=True)
+            await interaction.followup.send("✅ New SSH sent in DM.", ephemeral=True)
         except Exception as e:
-            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
 
     @ui.button(label="Get SSH Info", style=discord.ButtonStyle.blurple)
     async def btn_get_ssh(self, interaction: discord.Interaction, _: ui.Button):
         try:
-            c = self._container()
+            c = await self._container()
             ip = c.attrs['NetworkSettings'].get('IPAddress') or get_shared_ipv4()
             pwd = get_ssh_pass(self.container_name)
             msg = (
@@ -2178,7 +4843,7 @@ async def manage(interaction: discord.Interaction):
     # prevent “application did not respond”
     await interaction.response.defer(ephemeral=True)
 
-    owned = list_user_vps(interaction.user.id)
+    owned = list_user_vps(interaction.user.id) + acl.shared_with(interaction.user.id)
     if not owned:
         await interaction.followup.send("❌ You have no VPS linked to your account.", ephemeral=True)
         return
@@ -2186,10 +4851,10 @@ async def manage(interaction: discord.Interaction):
     # Single VPS -> show directly
     if len(owned) == 1:
         cname = owned[0]
-        status, color, ram, cpu, disk, ip = container_stats(cname)
+        status, color, ram, cpu, disk, ip, measured = await container_stats(cname)
         embed = discord.Embed(
             title=f"⚙ VPS Manager — {cname}",
-            description=f"**Status:** {status}\n**RAM:** 64gb\n**CPU:** 10\n**Disk:** 190gb\n**IP:** `{ip}`",
+            description=f"**Status:** {status}\n**RAM:** 64gb\n**CPU:** 10\n**Disk:** 190gb\n{resource_line(ram, cpu, measured)}\n**IP:** `{ip}`",
             color=color
         )
         await interaction.followup.send(embed=embed, view=ManageVPSView(cname, interaction.user.id), ephemeral=True)
@@ -2204,10 +4869,10 @@ async def manage(interaction: discord.Interaction):
 
         async def callback(self, select_inter: discord.Interaction):
             cname = self.values[0]
-            status, color, ram, cpu, disk, ip = container_stats(cname)
+            status, color, ram, cpu, disk, ip, measured = await container_stats(cname)
             embed = discord.Embed(
                 title=f"⚙ VPS Manager — {cname}",
-                description=f"**Status:** {status}\n**RAM:** 64\n**CPU:** 10\n**Disk:** 190gb\n**IP:** `{ip}`",
+                description=f"**Status:** {status}\n**RAM:** 64\n**CPU:** 10\n**Disk:** 190gb\n{resource_line(ram, cpu, measured)}\n**IP:** `{ip}`",
                 color=color
             )
             await select_inter.response.send_message(
@@ -2221,7 +4886,7 @@ async def manage(interaction: discord.Interaction):
             super().__init__(timeout=None)
             self.add_item(VPSSelect())
 
-    await interaction.response.defer(ephemeral=True)
+    await interaction.followup.send("Select the VPS to manage:", view=VPSSelectView(), ephemeral=True)
     
 # ====== /addadmin_bot (ADMIN PANEL) ======
 class AdminUserModal(ui.Modal, title="Admin User ID"):
@@ -2347,16 +5012,26 @@ async def status_cmd(interaction: discord.Interaction):
 
     vm_total = 0
     running = 0
-    online_str = "🟢 Online"
-    if docker_ok():
+    if state_cache.live and docker_ok():
+        vm_total, running = state_cache.counts()
+    elif docker_ok():
         try:
-            allc = docker_client.containers.list(all=True)
+            allc = await docker_pool.run(docker_client.containers.list, all=True, timeout=DOCKER_DEADLINES["read"])
             vm_total = len(allc)
             running = len([c for c in allc if c.status == "running"])
         except Exception:
             pass
-    else:
-        online_str = "🔴 Offline (Docker)"
+    # read after the listing so a timeout there is reflected here
+    online_str = docker_health()
+    pool = docker_pool.stats()
+    images_str = ", ".join(f"{img.label} {img.state}" for img in catalog.entries())
+    warm_str = ", ".join(f"{image} {n}/{warm_pool.targets[image]}" for image, n in warm_pool.counts().items())
+    oversized = capacity.oversized()
+    oversized_str = ""
+    if oversized:
+        names = ", ".join(f"`{rec.name}` ({rec.ram} RAM / {rec.cpu} CPU)" for rec in oversized[:10])
+        more = f" and {len(oversized) - 10} more" if len(oversized) > 10 else ""
+        oversized_str = f"**Plans bigger than the node (/resize them):** {names}{more}\n"
 
     embed = discord.Embed(
         title="AMD-X7 NODE",
@@ -2365,15 +5040,27 @@ async def status_cmd(interaction: discord.Interaction):
             f"**Up:** {uptime}\n"
             f"**VM Total:** {vm_total}\n"
             f"**Running VM (Node):** {running}\n"
-            f"**Total RAM:** 64gb\n"
-            f"**Total CPU:** 10\n"
-            f"**Total Disk:** 190gb\n\n"
+            f"**Total RAM:** {ram_total}\n"
+            f"**Total CPU:** {cpu_total}\n"
+            f"**Total Disk:** {disk_total}\n"
+            f"**Headroom:** {capacity.summary()}\n"
+            f"{oversized_str}\n"
             f"**Shared IPv4 VPS IP Status:** Online\n"
-            f"**Ip = {ip}**"
+            f"**Ip = {ip}**\n\n"
+            f"**Docker calls:** {pool['in_flight']}/{pool['workers']} busy, {pool['queued']} queued, "
+            f"avg {pool['avg_ms']}ms, max {pool['max_ms']}ms\n"
+            f"**Docker breaker:** {docker_breaker.state}, {docker_breaker.failures} recent timeouts, "
+            f"tripped {docker_breaker.trips}x\n"
+            f"**Warm pool:** {warm_str}\n"
+            f"**Images:** {images_str}"
         ),
-        color=discord.Color.green() if "Online" in online_str else discord.Color.red()
+        color=discord.Color.green() if "Online" in online_str
+        else discord.Color.orange() if "🟡" in online_str else discord.Color.red()
     )
     embed.set_footer(text="Made by loenly.king")
     await interaction.followup.send(embed=embed, ephemeral=True)
 
+# One-shot migration of database.txt / access.txt / ssh_creds.txt into the registry
+registry.import_legacy(database_file, ACCESS_FILE, SSH_CREDS_FILE)
+
 bot.run(TOKEN)